@@ -0,0 +1,280 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2009 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of loading, sorting and serializing DataTables.
+
+Synthetic tables are generated for every combination of size, type mix and
+description shape, and every operation is timed on them. The best of a few
+runs gives the rows per second, and a separate traced run the peak memory.
+
+Usage:
+  python benchmarks/gviz_api_benchmark.py --sizes 1000,100000 \\
+      --json results.json
+  python benchmarks/gviz_api_benchmark.py --compare results.json
+
+Run it from the repository root, or with gviz_api importable.
+"""
+
+__author__ = "Amit Weinstein, Misha Seltzer, Jacob Baskin"
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+try:
+  import tracemalloc
+except ImportError:
+  tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import gviz_api
+
+try:
+  _timer = time.perf_counter
+except AttributeError:
+  _timer = time.time
+
+
+# The columns of each type mix, as (id, type, function of the row number
+# returning the value).
+_START_DATE = datetime.datetime(2001, 2, 3, 4, 5, 6)
+_MIXES = {
+    "numeric": [
+        ("int", "number", lambda i: i * 7919 % 100003),
+        ("float", "number", lambda i: i / 7.0),
+        ("big", "number", lambda i: i * 1e12),
+        ("neg", "number", lambda i: -i)],
+    "string": [
+        ("name", "string", lambda i: "name %d" % i),
+        ("text", "string", lambda i: "Lorem ipsum dolor sit amet %d " % i * 4),
+        ("quoted", "string", lambda i: 'say "%d", <b>\\ok</b>' % i),
+        ("unicode", "string", lambda i: u"\u05e9\u05dc\u05d5\u05dd %d" % i)],
+    "temporal": [
+        ("date", "date",
+         lambda i: (_START_DATE + datetime.timedelta(days=i)).date()),
+        ("datetime", "datetime",
+         lambda i: _START_DATE + datetime.timedelta(seconds=i * 61)),
+        ("time", "timeofday",
+         lambda i: (_START_DATE + datetime.timedelta(seconds=i)).time())],
+    "formatted": [
+        ("amount", "number", lambda i: (i * 10, "$%d.00" % (i * 10))),
+        ("flag", "boolean", lambda i: (i % 2 == 0, "yes" if i % 2 else "no")),
+        ("label", "string", lambda i: ("l%d" % i, "Label %d" % i))],
+    "custom_properties": [
+        ("value", "number",
+         lambda i: (i, None, {"style": "color: %s" % ("red", "blue")[i % 2]})),
+        ("note", "string", lambda i: ("n%d" % i, "Note %d" % i, {"n": i}))],
+}
+
+_SHAPES = ("flat_list", "flat_dict", "nested_dict")
+
+# The operations timed besides LoadData, as (name, function of the table and
+# the column to sort by).
+_OPERATIONS = [
+    ("sort", lambda table, col: table._PreparedData((col, "desc"))),
+    ("ToJSon", lambda table, col: table.ToJSon()),
+    ("ToJSonResponse", lambda table, col: table.ToJSonResponse()),
+    ("ToJSonResponseBytes", lambda table, col: table.ToJSonResponseBytes()),
+    ("ToJSCode", lambda table, col: table.ToJSCode("t")),
+    ("ToCsv", lambda table, col: table.ToCsv()),
+    ("ToTsvExcel", lambda table, col: table.ToTsvExcel()),
+    ("ToHtml", lambda table, col: table.ToHtml()),
+]
+
+
+def MakeTableData(size, mix, shape):
+  """Returns a table description and its data.
+
+  Args:
+    size: The number of rows.
+    mix: The name of the type mix of the columns.
+    shape: "flat_list" for a list description with list rows, "flat_dict" for
+           a dictionary description with dictionary rows, or "nested_dict" for
+           a description keyed by a string column with the rows in a
+           dictionary under their key.
+
+  Returns:
+    A tuple of the description and the data, to pass to DataTable().
+  """
+  columns = _MIXES[mix]
+  if shape == "flat_list":
+    description = [(col_id, col_type) for col_id, col_type, _ in columns]
+    data = [[value(i) for _, _, value in columns] for i in range(size)]
+  elif shape == "flat_dict":
+    description = dict([(col_id, col_type)
+                        for col_id, col_type, _ in columns])
+    data = [dict([(col_id, value(i)) for col_id, _, value in columns])
+            for i in range(size)]
+  else:
+    description = {("key", "string"): dict(
+        [(col_id, col_type) for col_id, col_type, _ in columns])}
+    data = dict([("k%08d" % i,
+                  dict([(col_id, value(i)) for col_id, _, value in columns]))
+                 for i in range(size)])
+  return description, data
+
+
+def Measure(function, repeat):
+  """Returns the best time of calling function and its peak memory.
+
+  Args:
+    function: The function to measure.
+    repeat: The number of timed calls.
+
+  Returns:
+    A tuple of the best time in seconds and the peak memory in bytes
+    allocated by a separate call (None if tracemalloc is not available).
+  """
+  best = None
+  for _ in range(repeat):
+    gc.collect()
+    start = _timer()
+    function()
+    elapsed = _timer() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  peak = None
+  if tracemalloc is not None:
+    gc.collect()
+    tracemalloc.start()
+    try:
+      function()
+      peak = tracemalloc.get_traced_memory()[1]
+    finally:
+      tracemalloc.stop()
+  return best, peak
+
+
+def RunBenchmarks(sizes, mixes, shapes, operations, repeat, log=None):
+  """Runs the benchmarks and returns their results.
+
+  Args:
+    sizes: The numbers of rows of the tables.
+    mixes: The names of the type mixes of the tables.
+    shapes: The description shapes of the tables.
+    operations: The names of the operations to time, besides loading.
+    repeat: The number of timed runs of every operation.
+    log: Optional. A file to report every result to as it is measured.
+
+  Returns:
+    A list of result dictionaries, with the size, mix, shape, operation,
+    seconds, rows_per_sec and peak_bytes of every measurement.
+  """
+  results = []
+  for size in sizes:
+    for mix in mixes:
+      for shape in shapes:
+        description, data = MakeTableData(size, mix, shape)
+        table = gviz_api.DataTable(description)
+        # Rows of the custom properties mix carry row custom properties too.
+        row_cp = {"row": "cp"} if mix == "custom_properties" else None
+        measurements = [("LoadData",
+                         lambda: table.LoadData(data, row_cp))]
+        sort_col = _MIXES[mix][0][0]
+        for name, operation in _OPERATIONS:
+          if name in operations:
+            measurements.append(
+                (name, lambda op=operation: op(table, sort_col)))
+        for name, function in measurements:
+          seconds, peak = Measure(function, repeat)
+          result = {"size": size, "mix": mix, "shape": shape,
+                    "operation": name, "seconds": seconds,
+                    "rows_per_sec": float(size) / seconds if seconds else None,
+                    "peak_bytes": peak}
+          results.append(result)
+          if log is not None:
+            log.write(FormatResult(result) + "\n")
+            log.flush()
+  return results
+
+
+def FormatResult(result, baseline=None):
+  """Returns a line describing a result, compared to a baseline if given."""
+  line = "%8d %-17s %-11s %-19s %12.0f rows/s %10s" % (
+      result["size"], result["mix"], result["shape"], result["operation"],
+      result["rows_per_sec"] or 0,
+      "%.1f MiB" % (result["peak_bytes"] / 1048576.0)
+      if result["peak_bytes"] is not None else "-")
+  if baseline and baseline.get("rows_per_sec") and result["rows_per_sec"]:
+    line += " %+6.1f%%" % (
+        100.0 * (result["rows_per_sec"] / baseline["rows_per_sec"] - 1))
+  return line
+
+
+def _Key(result):
+  return result["size"], result["mix"], result["shape"], result["operation"]
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+  parser.add_argument("--sizes", default="1000,10000,100000",
+                      help="Comma separated numbers of rows, e.g. "
+                      "1000,10000,100000,1000000.")
+  parser.add_argument("--mixes", default=",".join(sorted(_MIXES)),
+                      help="Comma separated type mixes, of: %s." %
+                      ", ".join(sorted(_MIXES)))
+  parser.add_argument("--shapes", default=",".join(_SHAPES),
+                      help="Comma separated description shapes, of: %s." %
+                      ", ".join(_SHAPES))
+  parser.add_argument("--operations",
+                      default=",".join(name for name, _ in _OPERATIONS),
+                      help="Comma separated operations to time besides "
+                      "LoadData.")
+  parser.add_argument("--repeat", type=int, default=3,
+                      help="The number of timed runs of every operation.")
+  parser.add_argument("--json", help="A file to write the results to.")
+  parser.add_argument("--compare",
+                      help="A results file of a previous run. Its "
+                      "parameters are reused, and the change in rows/s is "
+                      "reported.")
+  args = parser.parse_args(argv)
+
+  baseline = {}
+  sizes = [int(size) for size in args.sizes.split(",")]
+  mixes = args.mixes.split(",")
+  shapes = args.shapes.split(",")
+  operations = args.operations.split(",")
+  if args.compare:
+    with open(args.compare) as f:
+      previous = json.load(f)
+    baseline = dict((_Key(result), result) for result in previous["results"])
+    sizes = sorted(set(key[0] for key in baseline))
+    mixes = sorted(set(key[1] for key in baseline))
+    shapes = sorted(set(key[2] for key in baseline))
+    operations = sorted(set(key[3] for key in baseline))
+
+  results = RunBenchmarks(sizes, mixes, shapes, operations, args.repeat,
+                          log=None if baseline else sys.stdout)
+  for result in results if baseline else ():
+    print(FormatResult(result, baseline.get(_Key(result))))
+
+  if args.json:
+    with open(args.json, "w") as f:
+      json.dump({"python": sys.version,
+                 "platform": platform.platform(),
+                 "time": datetime.datetime.utcnow().isoformat(),
+                 "repeat": args.repeat,
+                 "results": results}, f, indent=1, sort_keys=True)
+
+
+if __name__ == "__main__":
+  main()
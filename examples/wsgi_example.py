@@ -0,0 +1,45 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2008 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example of a Google Visualization data source served over WSGI."""
+
+__author__ = "Misha Seltzer"
+
+from wsgiref import simple_server
+
+import gviz_api
+import gviz_api_server
+
+description = {"name": ("string", "Name"),
+               "salary": ("number", "Salary"),
+               "full_time": ("boolean", "Full Time Employee")}
+data = [{"name": "Mike", "salary": (10000, "$10,000"), "full_time": True},
+        {"name": "Jim", "salary": (800, "$800"), "full_time": False},
+        {"name": "Alice", "salary": (12500, "$12,500"), "full_time": True},
+        {"name": "Bob", "salary": (7000, "$7,000"), "full_time": True}]
+
+
+def MakeTable(unused_params):
+  return gviz_api.DataTable(description, data)
+
+
+app = gviz_api_server.WSGIDataSource(
+    MakeTable, columns_order=("name", "salary", "full_time"),
+    order_by="salary")
+
+if __name__ == "__main__":
+  # Use http://localhost:8080/ as your Google Visualization data source.
+  simple_server.make_server("", 8080, app).serve_forever()
@@ -26,19 +26,149 @@ Google Visualization API.
 
 __author__ = "Amit Weinstein, Misha Seltzer, Jacob Baskin"
 
+import array
+import codecs
+import copy
 import csv
 import datetime
 import decimal
+import functools
+try:
+  import asyncio
+except ImportError:
+  asyncio = None
 try:
   import html  # Python version 3.2 or higher
 except ImportError:
   import cgi as html  # Only used for .escape()
+import io
+import mmap
 import numbers
 import json
+import os
+import random
+import struct
+import sys
+import threading
+import time
 import types
+import zlib
 
 import six
 
+try:
+  from concurrent import futures
+except ImportError:
+  futures = None
+try:
+  import numpy
+except ImportError:
+  numpy = None
+try:
+  import orjson
+except ImportError:
+  orjson = None
+try:
+  import brotli
+except ImportError:
+  brotli = None
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+try:
+  import multiprocessing
+except ImportError:
+  multiprocessing = None
+try:
+  from multiprocessing import resource_tracker
+  from multiprocessing import shared_memory
+except ImportError:
+  shared_memory = None
+
+
+# The number of rows serialized between two chunks of streamed output.
+_CHUNK_ROWS = 1000
+
+# Tables with fewer rows are serialized serially even if workers are given.
+# Larger ones are split into parts of _PARALLEL_PART_ROWS rows.
+_PARALLEL_MIN_ROWS = 50000
+_PARALLEL_PART_ROWS = 20000
+
+# Raw deflate segments of cached rows are compressed with up to this many
+# bytes of the rows before them as history, the window of deflate streams.
+_DEFLATE_WINDOW = 32768
+# Cached rows are compressed on every response until they add up to a
+# segment of this many bytes, which is cached.
+_DEFLATE_MIN_SEGMENT = 16384
+
+# Worker processes started by DataTable._MapParts() are forked with the rows
+# to serialize where the platform and Python version allow it (3.7 added the
+# initializer of process pools).
+_FORK_CONTEXT = None
+if (futures is not None and multiprocessing is not None and
+    sys.version_info >= (3, 7) and
+    "fork" in multiprocessing.get_all_start_methods()):
+  _FORK_CONTEXT = multiprocessing.get_context("fork")
+
+# Tables with fewer rows are sorted by list.sort() even if numpy is installed,
+# see DataTable._NumpySortOrder().
+# Floats sorted by numpy along with integers must represent them exactly.
+_NUMPY_SORT_MIN_ROWS = 10000
+_NUMPY_NUMBER_TYPES = frozenset(six.integer_types + (float, bool))
+_NUMPY_MAX_EXACT_INTEGER = 2 ** 53
+
+# The binary format written by DataTable.ToBinary(). The image starts with
+# the magic, the format version and the length of a JSON header describing
+# the table, followed by the 8-byte aligned column buffers.
+_BINARY_MAGIC = b"GVZB"
+_BINARY_VERSION = 1
+_BINARY_PREFIX = struct.Struct("<4sHHI")
+_BINARY_HEADER_KEYS = ("cols", "rows", "p", "columns", "row_p", "row_p_index")
+_BINARY_COLUMN_KEYS = ("id", "type", "label", "custom_properties")
+_DATETIME_ORIGIN = datetime.datetime(1, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_INFINITY = float("inf")
+
+_timer = getattr(time, "perf_counter", time.time)
+
+# The zlib level of the rows of pickled DataTables.
+_PICKLE_COMPRESSION = 1
+
+# Tables published by DataTable.ToSharedMemory() are held in a segment per
+# generation, named after the table and the generation. The segment named
+# after the table holds the current generation.
+_GENERATION = struct.Struct("<Q")
+_SEGMENT_NAME = "%s.%d"
+
+# The segments published by this process, as a tuple of the generation
+# segment and the current image segment by table name.
+_published_segments = {}
+_published_segments_lock = threading.Lock()
+
+# The number of latest versions of a table that ToJSonResponse() can still
+# answer with only the rows appended since. Older versions get all the rows.
+_DELTA_VERSIONS = 1000
+
+# The maximal number of literals memoized for a date/time column by a single
+# serialization.
+_LITERAL_CACHE_SIZE = 10000
+
+# With dictionary_columns="auto", a string column is dictionary encoded if the
+# first load or append of at least _DICTIONARY_MIN_ROWS rows holds at most
+# _DICTIONARY_MAX_RATIO distinct strings per row in it.
+_DICTIONARY_MIN_ROWS = 1000
+_DICTIONARY_MAX_RATIO = 0.1
+
+# The types of values which CoerceValue() returns unchanged for each column
+# type. Serializers skip coercing such values.
+_PLAIN_TYPES = {"number": (int, float),
+                "string": (six.text_type,),
+                "boolean": (bool,),
+                "date": (datetime.date,),
+                "datetime": (datetime.datetime,),
+                "timeofday": (datetime.time,)}
+
 
 class DataTableException(Exception):
   """The general exception object thrown by DataTable."""
@@ -54,6 +184,14 @@ class DataTableJSONEncoder(json.JSONEncoder):
                               ensure_ascii=False)
 
   def default(self, o):
+    if isinstance(o, (datetime.date, datetime.time)):
+      return self.TemporalValue(o)
+    else:
+      return super(DataTableJSONEncoder, self).default(o)
+
+  @staticmethod
+  def TemporalValue(o):
+    """Returns the JSON value of a date/time/datetime object."""
     if isinstance(o, datetime.datetime):
       if o.microsecond == 0:
         # If the time doesn't have ms-resolution, leave it out to keep
@@ -63,13 +201,700 @@ class DataTableJSONEncoder(json.JSONEncoder):
       else:
         return "Date(%d,%d,%d,%d,%d,%d,%d)" % (
             o.year, o.month - 1, o.day, o.hour, o.minute, o.second,
-            o.microsecond / 1000)
+            o.microsecond // 1000)
     elif isinstance(o, datetime.date):
       return "Date(%d,%d,%d)" % (o.year, o.month - 1, o.day)
-    elif isinstance(o, datetime.time):
+    else:
       return [o.hour, o.minute, o.second]
+
+
+class _OrjsonEncoder(object):
+  """JSON encoder producing the output of DataTableJSONEncoder with orjson.
+
+  orjson does not format all floats like the json module. DataTable marks
+  such floats as _JSonFloat while building its JSON objects, which makes
+  this encoder fall back to DataTableJSONEncoder, as it does for any other
+  object orjson cannot encode (such as integers beyond 64 bits or
+  non-string dictionary keys).
+  """
+
+  def encode(self, o):
+    if type(o) is float and not _IsOrjsonFloat(o):
+      return DataTableJSONEncoder().encode(o)
+    try:
+      return orjson.dumps(o, default=self.default,
+                          option=orjson.OPT_PASSTHROUGH_DATETIME).decode(
+                              "utf-8")
+    except orjson.JSONEncodeError:
+      return DataTableJSONEncoder().encode(o)
+
+  def default(self, o):
+    if isinstance(o, (datetime.date, datetime.time)):
+      return DataTableJSONEncoder.TemporalValue(o)
+    raise TypeError("Object of type %s is not JSON serializable" % type(o))
+
+
+class _LiteralCache(dict):
+  """A bounded memo of the literals formatted for date/time values.
+
+  Time series repeat the same dates across many rows, so every serializer
+  formats each distinct value of a date/time column once. Timezone aware
+  values are always formatted, as equal values may differ in their fields.
+  """
+
+  def __init__(self, formatter):
+    dict.__init__(self)
+    self.formatter = formatter
+
+  def __missing__(self, value):
+    literal = self.formatter(value)
+    if len(self) < _LITERAL_CACHE_SIZE:
+      self[value] = literal
+    return literal
+
+  def Format(self, value):
+    """Returns the literal of a date, time or datetime object."""
+    if getattr(value, "tzinfo", None) is None:
+      return self[value]
+    return self.formatter(value)
+
+
+class _ColumnDictionary(object):
+  """The distinct strings of a dictionary encoded string column.
+
+  The strings appended to the column are replaced by the equal string held
+  here, so that all rows share one object per distinct value. The forms the
+  serializers format each string into are computed once per table and kept
+  here as well.
+  """
+
+  def __init__(self):
+    self.values = {}
+    self.forms = {}
+
+  def Formatter(self, form, formatter):
+    """Returns the formatter, memoizing its result for plain strings.
+
+    Args:
+      form: The name of the memoized form, e.g. "html".
+      formatter: A function from a raw cell value to its form.
+
+    Returns:
+      A function equivalent to formatter.
+    """
+    cache = self.forms.setdefault(form, {})
+
+    def Format(value):
+      if type(value) is not six.text_type:
+        return formatter(value)
+      try:
+        return cache[value]
+      except KeyError:
+        formatted = cache[value] = formatter(value)
+        return formatted
+    return Format
+
+
+class _ColumnarRows(object):
+  """The rows of a binary table image, decoded as they are read.
+
+  A read-only sequence standing for the list of rows of a DataTable opened
+  by DataTable.Open(). The rows are decoded from the column buffers of the
+  image a block of _CHUNK_ROWS rows at a time, so that a memory-mapped image
+  is only copied into the memory of a process while it is serialized.
+  Slices are sequences of the same image.
+  """
+
+  def __init__(self, header, buffers, source=None):
+    """Initializes the rows of an image.
+
+    Args:
+      header: The JSON header of the image, as written by ToBinary().
+      buffers: The list of the buffers of every column of the image.
+      source: Optional. An object to keep alive with the buffers, such as
+              the shared memory segment holding them.
+    """
+    self.start = 0
+    self.stop = header["rows"]
+    self.row_cps = dict([(i, header["row_p"][cp_index])
+                         for i, cp_index in header["row_p_index"]])
+    # The distinct strings of dictionary encoded columns and the values of
+    # JSON encoded ones are decoded once.
+    self.columns = []
+    for col, column_header, column_buffers in zip(
+        header["cols"], header["columns"], buffers):
+      encoding = column_header["encoding"]
+      decoded = None
+      if encoding == "dictionary":
+        decoded = DataTable._DecodeColumn(
+            "string", "utf8", len(column_buffers[2]) // 8 - 1,
+            column_buffers[2:])
+      elif encoding == "json":
+        decoded = DataTable._DecodeColumn(col["type"], encoding, self.stop,
+                                          column_buffers[1:])
+        if not isinstance(decoded, list) or len(decoded) != self.stop:
+          raise DataTableException(
+              "The json buffer of a column does not hold %d rows" % self.stop)
+      # The formatted values and custom properties of cells, by block.
+      extras = {}
+      for extra in column_header.get("extras", ()):
+        extras.setdefault(extra[0] // _CHUNK_ROWS, []).append(
+            (extra[0], tuple(extra[1:])))
+      self.columns.append((col["id"], col["type"], encoding, column_buffers,
+                           decoded, extras))
+    self.num_rows = self.stop
+    self._block = (None, None)
+    # Set last, so that the buffers are released before the source is.
+    self.source = source
+
+  def __len__(self):
+    return self.stop - self.start
+
+  def __iter__(self):
+    i = self.start
+    while i < self.stop:
+      block_start = i - i % _CHUNK_ROWS
+      rows = self._Block(block_start // _CHUNK_ROWS)
+      for row in rows[i - block_start:self.stop - block_start]:
+        yield row
+      i = block_start + _CHUNK_ROWS
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      start, stop, step = index.indices(len(self))
+      if step != 1:
+        return list(self)[index]
+      rows = _ColumnarRows.__new__(_ColumnarRows)
+      rows.__dict__.update(self.__dict__)
+      rows.start = self.start + start
+      rows.stop = self.start + max(start, stop)
+      return rows
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("row index out of range")
+    index += self.start
+    return self._Block(index // _CHUNK_ROWS)[index % _CHUNK_ROWS]
+
+  def __reduce__(self):
+    # Copies are plain lists, the image is not pickled.
+    return list, (list(self),)
+
+  def _Block(self, block_index):
+    """Returns the list of rows of a block of the image."""
+    cached_index, rows = self._block
+    if cached_index == block_index:
+      return rows
+    start = block_index * _CHUNK_ROWS
+    stop = min(start + _CHUNK_ROWS, self.num_rows)
+    num_rows = stop - start
+    # The bitmap of a block without null cells.
+    full = b"\xff" * (num_rows // 8) + (
+        bytes(bytearray([(1 << num_rows % 8) - 1])) if num_rows % 8 else b"")
+    col_ids = [column[0] for column in self.columns]
+    columns_values = []
+    nulls = []
+    for col_id, value_type, encoding, buffers, decoded, extras in self.columns:
+      columns_values.append(self._DecodeBlock(
+          value_type, encoding, buffers[1:], decoded, start, stop))
+      validity = bytearray(buffers[0][start >> 3:(stop + 7) >> 3])
+      if validity != full:
+        nulls.append((col_id, [i for i in range(num_rows)
+                               if not validity[i >> 3] >> (i & 7) & 1]))
+    dicts = [dict(zip(col_ids, cells)) for cells in zip(*columns_values)]
+    if not col_ids:
+      dicts = [{} for unused_i in range(num_rows)]
+    # Null cells are left out of the rows.
+    for col_id, indices in nulls:
+      for i in indices:
+        del dicts[i][col_id]
+    for column in self.columns:
+      col_id, extras = column[0], column[5]
+      for i, extra in extras.get(block_index, ()):
+        row = dicts[i - start]
+        row[col_id] = (row.get(col_id),) + extra
+    if self.row_cps:
+      rows = [(row, self.row_cps.get(i))
+              for i, row in enumerate(dicts, start)]
     else:
-      return super(DataTableJSONEncoder, self).default(o)
+      rows = [(row, None) for row in dicts]
+    self._block = (block_index, rows)
+    return rows
+
+  @staticmethod
+  def _DecodeBlock(value_type, encoding, buffers, decoded, start, stop):
+    """Returns the values of a column in the given range of rows."""
+    if encoding == "dictionary":
+      codes = DataTable._BytesToArray("i", buffers[0][start * 4:stop * 4])
+      if not decoded:
+        return [None] * len(codes)
+      return [decoded[code] for code in codes]
+    if encoding == "json":
+      return decoded[start:stop]
+    if encoding == "bitmap":
+      # Blocks start on a byte of the bitmap.
+      buffers = [buffers[0][start >> 3:(stop + 7) >> 3]]
+    elif encoding == "utf8":
+      # The offsets index the whole blob.
+      buffers = [buffers[0][start * 8:(stop + 1) * 8], buffers[1]]
+    else:
+      width = 4 if encoding == "days" else 8
+      buffers = [buffers[0][start * width:stop * width]]
+    return DataTable._DecodeColumn(value_type, encoding, stop - start, buffers)
+
+
+class _ColumnFormatter(object):
+  """Formats the values of a column, see DataTable.SetColumnFormatter().
+
+  Columns repeat the same values across many rows, so the formatted value of
+  each distinct value is memoized, up to _LITERAL_CACHE_SIZE of them.
+  """
+
+  def __init__(self, formatter, value_type):
+    if not callable(formatter) and not isinstance(formatter,
+                                                  six.string_types):
+      raise DataTableException(
+          "Expected a formatting pattern or function, given %s." %
+          type(formatter))
+    self.formatter = formatter
+    self.value_type = value_type
+    self.cache = {}
+
+  def Format(self, value):
+    """Returns the formatted value of a non-null value of the column type."""
+    # Equal values of different types, like 1 and 1.0, may format apart.
+    # Timezone aware values are always formatted, as equal values may differ
+    # in their fields.
+    key = (type(value), value)
+    if getattr(value, "tzinfo", None) is None and key in self.cache:
+      return self.cache[key]
+    if callable(self.formatter):
+      formatted = self.formatter(value)
+    elif self.value_type in ("date", "datetime", "timeofday"):
+      formatted = value.strftime(self.formatter)
+    else:
+      formatted = self.formatter.format(value)
+    if not isinstance(formatted, six.string_types):
+      raise DataTableException("Formatted value is not string, given %s." %
+                               type(formatted))
+    if len(self.cache) < _LITERAL_CACHE_SIZE:
+      self.cache[key] = formatted
+    return formatted
+
+  def Cell(self, value):
+    """Returns a raw cell with its formatted value, unless it has one.
+
+    Args:
+      value: A raw cell value, as accepted by DataTable.CoerceValue().
+
+    Returns:
+      A (value, formatted value[, custom properties]) tuple for non-null
+      values, otherwise the value as is.
+    """
+    if value is None:
+      return value
+    if isinstance(value, tuple):
+      if len(value) < 2 or value[0] is None or value[1] is not None:
+        return value
+      return (value[0], self.Format(
+          DataTable.CoerceValue(value[0], self.value_type))) + value[2:]
+    return (value, self.Format(DataTable.CoerceValue(value, self.value_type)))
+
+
+class _JSonFloat(float):
+  """A float which orjson does not format like the json module."""
+  pass
+
+
+def _IsOrjsonFloat(value):
+  """Returns whether orjson formats a float like the json module.
+
+  orjson encodes NaN and infinities as null, and does not always follow the
+  exponent notation of repr(), which is used out of [1e-4, 1e16).
+  """
+  return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+def _JSonProperties(obj):
+  """Marks the floats of custom properties which orjson would not encode.
+
+  Args:
+    obj: A custom properties dictionary, or any value nested in it.
+
+  Returns:
+    The given object if it holds no such float, otherwise a copy of it in
+    which these floats are replaced by _JSonFloat.
+  """
+  if type(obj) is float:
+    return obj if _IsOrjsonFloat(obj) else _JSonFloat(obj)
+  if isinstance(obj, dict):
+    items = [(key, _JSonProperties(value)) for key, value in obj.items()]
+    if all(value is obj[key] for key, value in items):
+      return obj
+    return dict(items)
+  if isinstance(obj, (list, tuple)):
+    values = [_JSonProperties(value) for value in obj]
+    if all(new is old for new, old in zip(values, obj)):
+      return obj
+    return values
+  return obj
+
+
+def _AttachSharedMemory(name, table_name):
+  """Returns an existing shared memory segment, attached without owning it.
+
+  Before Python 3.13 the resource tracker unlinks the segments a process
+  attached when it exits, so they are unregistered from it. The tracker of
+  the process which published the table (shared by the processes it forks)
+  must keep them though, as it unlinks them when the publisher exits.
+
+  Args:
+    name: The name of the segment.
+    table_name: The name the segment is published under.
+  """
+  try:
+    return shared_memory.SharedMemory(name, track=False)
+  except TypeError:
+    segment = shared_memory.SharedMemory(name)
+    if os.name == "posix" and table_name not in _published_segments:
+      resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _RoundCell(value, digits):
+  """Returns a raw cell of a number column with its value rounded.
+
+  Args:
+    value: A raw cell value, as accepted by DataTable.CoerceValue().
+    digits: The number of digits after the decimal point.
+
+  Returns:
+    The cell, with its value rounded if it is a float.
+  """
+  if type(value) is float:
+    return round(value, digits)
+  if value is None or type(value) is int:
+    return value
+  if isinstance(value, tuple):
+    if not value or value[0] is None:
+      return value
+    return (_RoundCell(value[0], digits),) + value[1:]
+  value = DataTable.CoerceValue(value, "number")
+  if type(value) is float:
+    return round(value, digits)
+  return value
+
+
+def _NumpySortKey(values, value_type):
+  """Returns a numpy array ordered as the values of a column.
+
+  Args:
+    values: The raw cell values of a number, date or datetime column.
+    value_type: The type of the column.
+
+  Returns:
+    An array of numbers in the order list.sort() gives the values, or None if
+    numpy could not order them the same (e.g. for None or formatted values,
+    NaNs, aware datetimes or integers beyond 64 bits).
+  """
+  value_types = set(map(type, values))
+  if value_type == "number" and value_types <= _NUMPY_NUMBER_TYPES:
+    try:
+      array = numpy.array(values)
+    except OverflowError:
+      return None
+    if array.dtype.kind in "biu":
+      return array
+    if array.dtype.kind != "f" or numpy.isnan(array).any():
+      return None
+    if (value_types != set([float]) and
+        numpy.abs(array).max() > _NUMPY_MAX_EXACT_INTEGER):
+      return None
+    return array
+  # Converting to datetime64 is much slower than counting the days or
+  # microseconds in Python.
+  if value_type == "date" and value_types == set([datetime.date]):
+    return numpy.fromiter(map(datetime.date.toordinal, values), "i8",
+                          len(values))
+  if (value_type == "datetime" and value_types == set([datetime.datetime]) and
+      not [1 for value in values if value.tzinfo is not None]):
+    return numpy.array([(value - _DATETIME_ORIGIN) // _MICROSECOND
+                        for value in values], "i8")
+  return None
+
+
+def _NewDataTable(cls):
+  """Returns an uninitialized table, to be unpickled by __setstate__()."""
+  return cls.__new__(cls)
+
+
+def _SerializePart(table, method, rows, args):
+  """Serializes a part of the rows of a table, as a task of a worker pool."""
+  return getattr(table, method)(rows, *args)
+
+
+# The table and the rows serialized by a worker process started by
+# DataTable._MapParts(), set by _InitPartWorker() as the process starts.
+_part_worker_rows = None
+
+
+def _InitPartWorker(table, rows):
+  """Sets the table and rows of a forked worker process of _MapParts()."""
+  global _part_worker_rows
+  _part_worker_rows = (table, rows)
+
+
+def _SerializeRange(method, args, start, stop):
+  """Serializes a range of the rows of a forked worker process."""
+  table, rows = _part_worker_rows
+  return getattr(table, method)(rows[start:stop], *args)
+
+
+class _BrotliCompressor(object):
+  """Adapts brotli.Compressor to the interface of the zlib compressors."""
+
+  def __init__(self):
+    self._compressor = brotli.Compressor()
+
+  def compress(self, data):
+    return self._compressor.process(data)
+
+  def flush(self):
+    return self._compressor.finish()
+
+
+def _Compressor(codec):
+  """Returns a new incremental compressor for the given content coding.
+
+  Args:
+    codec: "gzip" or "deflate", or "br" or "zstd" if brotli or zstandard are
+           installed.
+
+  Returns:
+    An object with the compress() and flush() methods of zlib compressors.
+
+  Raises:
+    DataTableException: The content coding is not known or not installed.
+  """
+  if codec == "gzip":
+    return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  if codec == "deflate":
+    return zlib.compressobj(6)
+  if codec == "br" and brotli is not None:
+    return _BrotliCompressor()
+  if codec == "zstd" and zstandard is not None:
+    return zstandard.ZstdCompressor().compressobj()
+  raise DataTableException("Compression '%s' is not available" % codec)
+
+
+def _CompressChunks(chunks, codec):
+  """Returns an iterator over the compression of the given chunks.
+
+  Text chunks are encoded in UTF-8 before being compressed.
+  """
+  compressor = _Compressor(codec)
+
+  def Compressed():
+    for chunk in chunks:
+      if isinstance(chunk, six.text_type):
+        chunk = chunk.encode("utf-8")
+      compressed = compressor.compress(chunk)
+      if compressed:
+        yield compressed
+    yield compressor.flush()
+
+  return Compressed()
+
+
+def _DeflateSegment(data, history=b"", final=False):
+  """Returns the data compressed as raw deflate blocks.
+
+  The blocks refer back only to the given history, and end at a byte boundary,
+  so segments compressed with the data before them as history can be
+  concatenated into a single deflate stream whose last segment is final.
+
+  Args:
+    data: The bytes to compress.
+    history: Optional. The bytes preceding the data in the stream. Only its
+             last _DEFLATE_WINDOW bytes are used.
+    final: Optional. Whether the segment ends the stream.
+  """
+  if history:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                  zdict=history[-_DEFLATE_WINDOW:])
+  else:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+  return compressor.compress(data) + compressor.flush(
+      zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _DeflateStream(codec, pieces):
+  """Yields a gzip or deflate stream made of raw deflate segments.
+
+  Args:
+    codec: "gzip" or "deflate".
+    pieces: Tuples of the uncompressed data and its deflate segment, as
+            returned by _DeflateSegment(). The last segment must be final.
+  """
+  if codec == "gzip":
+    yield b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+    checksum, checksum_function = zlib.crc32(b""), zlib.crc32
+  else:
+    yield b"\x78\x9c"
+    checksum, checksum_function = zlib.adler32(b""), zlib.adler32
+  size = 0
+  for data, segment in pieces:
+    checksum = checksum_function(data, checksum)
+    size += len(data)
+    yield segment
+  if codec == "gzip":
+    yield struct.pack("<II", checksum & 0xffffffff, size & 0xffffffff)
+  else:
+    yield struct.pack(">I", checksum & 0xffffffff)
+
+
+class DataTableStats(object):
+  """Collects timings and counts of the phases of DataTable operations.
+
+  Assign an instance to the stats attribute of one or more DataTables (or
+  pass it to their constructor) to collect. The phases are:
+    append: Building the rows of AppendData() and LoadData(). Counts rows.
+    sort: Sorting rows by order_by. Counts rows.
+    build: Building the JSON objects of rows, including the conversion of
+           their cells. Counts rows.
+    convert: Coercing and converting cells for JSON, CSV and HTML output.
+             Counts cells.
+    encode: Encoding JSON objects into strings. Counts calls.
+  The size of every output is recorded by format: "json", "json_response",
+  "jscode", "csv", "tsv-excel", "html", "binary", and "response:<out>" for
+  the chunks of IterResponse(). The sizes of outputs returned as bytes are
+  summed in output_bytes, and the lengths of text outputs in characters in
+  output_chars, since counting their UTF-8 bytes would take another pass
+  over the output.
+
+  Subclasses may override Record() and RecordOutput() to forward the
+  measurements elsewhere, e.g. to a metrics pipeline.
+  """
+
+  def __init__(self):
+    self.seconds = {}
+    self.counts = {}
+    self.output_bytes = {}
+    self.output_chars = {}
+    self.outputs = {}
+    self._lock = threading.Lock()
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["_lock"]
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._lock = threading.Lock()
+
+  def Record(self, phase, seconds, count=1):
+    """Records the time spent in a phase, and the number of items handled."""
+    with self._lock:
+      self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+      self.counts[phase] = self.counts.get(phase, 0) + count
+
+  def RecordOutput(self, output_format, size=0, chars=0):
+    """Records an output of the given format.
+
+    Args:
+      output_format: The name of the format of the output.
+      size: The size in bytes of the parts of the output which are bytes.
+      chars: The length in characters of the parts which are text.
+    """
+    with self._lock:
+      if size or not chars:
+        self.output_bytes[output_format] = (
+            self.output_bytes.get(output_format, 0) + size)
+      if chars:
+        self.output_chars[output_format] = (
+            self.output_chars.get(output_format, 0) + chars)
+      self.outputs[output_format] = self.outputs.get(output_format, 0) + 1
+
+  def AsDict(self):
+    """Returns a copy of the statistics collected, e.g. for exporting."""
+    with self._lock:
+      return {"seconds": dict(self.seconds),
+              "counts": dict(self.counts),
+              "output_bytes": dict(self.output_bytes),
+              "output_chars": dict(self.output_chars),
+              "outputs": dict(self.outputs)}
+
+  def Reset(self):
+    """Clears the statistics collected."""
+    with self._lock:
+      self.seconds = {}
+      self.counts = {}
+      self.output_bytes = {}
+      self.output_chars = {}
+      self.outputs = {}
+
+
+def _Timed(function, total):
+  """Returns the function, adding the seconds spent in it to total[0]."""
+
+  def Timed(value):
+    start = _timer()
+    result = function(value)
+    total[0] += _timer() - start
+    return result
+
+  return Timed
+
+
+class _AsyncChunks(object):
+  """Asynchronous iterator over the chunks of a response iterator.
+
+  Each chunk is returned through a zero-length asyncio.sleep(), which lets
+  the event loop run other tasks before the next chunk is serialized.
+  """
+
+  def __init__(self, chunks):
+    self._chunks = chunks
+
+  def __aiter__(self):
+    return self
+
+  def __anext__(self):
+    try:
+      chunk = next(self._chunks)
+    except StopIteration:
+      raise StopAsyncIteration
+    return asyncio.sleep(0, result=chunk)
+
+
+# The JSON encoders which can be selected with SetJSONBackend().
+_JSON_ENCODERS = {"json": DataTableJSONEncoder}
+if orjson is not None:
+  _JSON_ENCODERS["orjson"] = _OrjsonEncoder
+_json_encoder_class = _JSON_ENCODERS.get("orjson", DataTableJSONEncoder)
+
+
+def SetJSONBackend(backend="auto"):
+  """Selects the JSON library used by the DataTable serializers.
+
+  By default, orjson is used when it is installed and the standard json
+  module otherwise. Both produce the same output.
+
+  Args:
+    backend: Optional. "json" for the standard library, "orjson" for orjson,
+             or "auto" for the default choice.
+
+  Raises:
+    DataTableException: The backend is not known or not installed.
+  """
+  global _json_encoder_class
+  if backend == "auto":
+    _json_encoder_class = _JSON_ENCODERS.get("orjson", DataTableJSONEncoder)
+  elif backend in _JSON_ENCODERS:
+    _json_encoder_class = _JSON_ENCODERS[backend]
+  else:
+    raise DataTableException("JSON backend '%s' is not available" % backend)
 
 
 class DataTable(object):
@@ -143,7 +968,9 @@ class DataTable(object):
     3  4  w
   """
 
-  def __init__(self, table_description, data=None, custom_properties=None):
+  def __init__(self, table_description, data=None, custom_properties=None,
+               cache_encoded_rows=False, stats=None, dictionary_columns=None,
+               compact_pickle=False):
     """Initialize the data table from a table schema and (optionally) data.
 
     See the class documentation for more information on table schema and data
@@ -161,13 +988,78 @@ class DataTable(object):
       custom_properties: Optional. A dictionary from string to string that
                          goes into the table's custom properties. This can be
                          later changed by changing self.custom_properties.
+      cache_encoded_rows: Optional. If True, the table keeps the JSON encoding
+                          of its rows for ToJSon() and ToJSonResponse() calls
+                          without order_by, so that after AppendData() only
+                          the new rows are encoded. The cache is dropped by
+                          LoadData() and SetRowsCustomProperties(), and does
+                          not notice changes made to the appended values or
+                          row custom properties in place.
+      stats: Optional. A DataTableStats to record the time spent in each phase
+             of loading and serializing the table, and the size of its
+             outputs. Nothing is recorded if it is None (the default).
+      dictionary_columns: Optional. A list of the IDs of string columns to
+                          dictionary encode, or "auto" to dictionary encode
+                          the string columns found to hold few distinct
+                          values. The rows of such a column share a single
+                          string object per distinct value, and the JSON,
+                          JS code and HTML forms of each value are computed
+                          once for the table rather than for every cell.
+      compact_pickle: Optional. If True, the table is pickled with its rows
+                      in the compressed binary format of ToBinary(), which
+                      is several times smaller but slower to pickle and
+                      unpickle than the rows themselves. See __reduce_ex__().
+                      Can be changed later through self.compact_pickle.
 
     Raises:
       DataTableException: Raised if the data and the description did not match,
                           or did not use the supported formats.
     """
     self.__columns = self.TableDescriptionParser(table_description)
-    self.__data = []
+    self.stats = stats
+    self.compact_pickle = compact_pickle
+    # Maps the ID of every dictionary encoded column to its _ColumnDictionary.
+    # The string columns of an "auto" table are dictionary encoded or not
+    # once they are first loaded with enough rows.
+    string_columns = [col["id"] for col in self.__columns
+                      if col["type"] == "string"]
+    self.__dictionaries = {}
+    self.__auto_dictionary_columns = set()
+    # Maps column IDs to the _ColumnFormatter set by SetColumnFormatter(),
+    # and to the digits set by SetColumnPrecision().
+    self.__formatters = {}
+    self.__precisions = {}
+    if dictionary_columns == "auto":
+      self.__auto_dictionary_columns.update(string_columns)
+    elif dictionary_columns:
+      for col_id in dictionary_columns:
+        if col_id not in string_columns:
+          raise DataTableException(
+              "Only string columns can be dictionary encoded, got '%s'" %
+              col_id)
+        self.__dictionaries[col_id] = _ColumnDictionary()
+    self.__cache_encoded_rows = cache_encoded_rows
+    # Maps a columns order to the rows list, the number of its rows encoded
+    # for the order and the list of fragments holding their comma separated
+    # JSON objects.
+    self.__encoded_rows = {}
+    # Maps a columns order to the list of cached fragments compressed, the
+    # list of tuples of their bytes and raw deflate segments, and the last
+    # _DEFLATE_WINDOW bytes of the compressed fragments.
+    self.__deflated_rows = {}
+    # The rows are published as a snapshot tuple of (rows list, number of
+    # rows, version, rows at version), replaced as a whole by every change.
+    # Readers take the tuple once and use the first "number of rows" rows of
+    # the list, so they need no lock. Writers hold the lock, and never change
+    # the rows of a published list other than by appending new ones at its
+    # end. Every change of the rows makes a new version. The rows at version
+    # dict holds the number of rows the list had at each of the last
+    # _DELTA_VERSIONS versions since rows were last changed by anything else
+    # than appending, so that the rows appended since can be listed. The epoch
+    # tells apart the versions of different tables.
+    self.__lock = threading.Lock()
+    self.__version_epoch = "%08x" % random.getrandbits(32)
+    self.__snapshot = ([], 0, 0, {0: 0})
     self.custom_properties = {}
     if custom_properties is not None:
       self.custom_properties = custom_properties
@@ -293,7 +1185,7 @@ class DataTable(object):
                                                    value.hour,
                                                    value.minute,
                                                    value.second,
-                                                   value.microsecond / 1000)
+                                                   value.microsecond // 1000)
     elif isinstance(value, datetime.date):
       return "new Date(%d,%d,%d)" % (value.year, value.month - 1, value.day)
     else:
@@ -316,6 +1208,214 @@ class DataTable(object):
     else:
       return six.text_type(value)
 
+  @staticmethod
+  def _EnsureStr(s):
+    """Compatibility function. Ensures using of str rather than unicode."""
+    if isinstance(s, str):
+      return s
+    return s.encode("utf-8")
+
+  @staticmethod
+  def _EnsureBytes(s):
+    """Returns the string encoded in UTF-8, unless it is bytes already."""
+    if isinstance(s, six.text_type):
+      return s.encode("utf-8")
+    return s
+
+  @staticmethod
+  def _JoinBytes(chunks, encoding="utf-8"):
+    """Returns the chunks written into a single buffer, as bytes.
+
+    Args:
+      chunks: An iterable of strings, which are encoded with the given
+              encoding, and bytes, which are written as is.
+      encoding: Optional. The encoding of the strings.
+    """
+    buf = io.BytesIO()
+    for chunk in chunks:
+      if isinstance(chunk, six.text_type):
+        chunk = chunk.encode(encoding)
+      buf.write(chunk)
+    return buf.getvalue()
+
+  @staticmethod
+  def _CsvFormatter(value_type):
+    """Returns a function formatting a raw cell of the given type for CSV.
+
+    The returned function is equivalent to coercing the value with
+    CoerceValue() and converting it with ToString(), but skips both for the
+    plain values most commonly found in each column type.
+
+    Args:
+      value_type: One of the types supported by CoerceValue().
+
+    Returns:
+      A function from a raw cell value to the string written in the CSV.
+    """
+    def FormatCell(value):
+      if value is None:
+        return ""
+      value = DataTable.CoerceValue(value, value_type)
+      if isinstance(value, tuple):
+        # We have a formatted value. Using it only for date/time types.
+        if value_type in ("date", "datetime", "timeofday"):
+          return DataTable._EnsureStr(DataTable.ToString(value[1]))
+        return DataTable._EnsureStr(DataTable.ToString(value[0]))
+      return DataTable._EnsureStr(DataTable.ToString(value))
+
+    if six.PY2:
+      return FormatCell
+
+    if value_type == "number":
+      def FormatNumber(value):
+        if type(value) in (int, float):
+          return str(value)
+        return FormatCell(value)
+      return FormatNumber
+    elif value_type == "string":
+      def FormatString(value):
+        if type(value) is str:
+          return value
+        return FormatCell(value)
+      return FormatString
+    elif value_type == "boolean":
+      def FormatBoolean(value):
+        if value is True:
+          return "true"
+        elif value is False:
+          return "false"
+        return FormatCell(value)
+      return FormatBoolean
+    # The plain type of each temporal column is printed as is by str().
+    plain_type = {"date": datetime.date,
+                  "datetime": datetime.datetime,
+                  "timeofday": datetime.time}.get(value_type)
+    literals = _LiteralCache(str)
+    def FormatTemporal(value):
+      if type(value) is plain_type:
+        return literals.Format(value)
+      return FormatCell(value)
+    return FormatTemporal
+
+  @staticmethod
+  def _HtmlFormatter(value_type):
+    """Returns a function formatting a raw cell of the given type for HTML.
+
+    The returned function is equivalent to coercing the value with
+    CoerceValue(), converting it with ToString() and escaping the result.
+    Plain numbers, booleans and date/time objects can never contain markup,
+    so they are converted without escaping.
+
+    Args:
+      value_type: One of the types supported by CoerceValue().
+
+    Returns:
+      A function from a raw cell value to the escaped HTML cell content.
+    """
+    def FormatCell(value):
+      if value is None:
+        return ""
+      value = DataTable.CoerceValue(value, value_type)
+      if isinstance(value, tuple):
+        # We have a formatted value and we're going to use it
+        return html.escape(DataTable.ToString(value[1]))
+      return html.escape(DataTable.ToString(value))
+
+    if value_type == "number":
+      def FormatNumber(value):
+        if type(value) in (int, float):
+          return str(value)
+        return FormatCell(value)
+      return FormatNumber
+    elif value_type == "boolean":
+      def FormatBoolean(value):
+        if value is True:
+          return "true"
+        elif value is False:
+          return "false"
+        return FormatCell(value)
+      return FormatBoolean
+    elif value_type == "string":
+      return FormatCell
+    plain_type = {"date": datetime.date,
+                  "datetime": datetime.datetime,
+                  "timeofday": datetime.time}.get(value_type)
+    literals = _LiteralCache(str)
+    def FormatTemporal(value):
+      if type(value) is plain_type:
+        return literals.Format(value)
+      return FormatCell(value)
+    return FormatTemporal
+
+  @staticmethod
+  def _JSonCellConverter(value_type):
+    """Returns a function converting a raw cell of the given type for JSON.
+
+    The returned function coerces the value with CoerceValue() and builds the
+    cell object of the JSON table, with date/time values already converted
+    to their JSON form. Plain values skip the coercion.
+
+    Args:
+      value_type: One of the types supported by CoerceValue().
+
+    Returns:
+      A function from a raw cell value to a cell object (a dictionary), or
+      None for a null cell.
+    """
+    if value_type in ("date", "datetime", "timeofday"):
+      convert = _LiteralCache(DataTableJSONEncoder.TemporalValue).Format
+    elif value_type == "number":
+      def convert(value):
+        if type(value) is float and not _IsOrjsonFloat(value):
+          return _JSonFloat(value)
+        return value
+    else:
+      convert = None
+    # Cell custom properties are usually shared by many cells, each distinct
+    # dictionary is prepared once. The dictionaries are kept with their
+    # result, so that their ids are not reused.
+    properties = {}
+
+    def ConvertCell(value):
+      value = DataTable.CoerceValue(value, value_type)
+      if value is None:
+        return None
+      if isinstance(value, tuple):
+        cell_obj = {"v": value[0]}
+        if value[0] is not None and convert is not None:
+          cell_obj["v"] = convert(value[0])
+        if len(value) > 1 and value[1] is not None:
+          cell_obj["f"] = value[1]
+        if len(value) == 3:
+          cell_cp = properties.get(id(value[2]))
+          if cell_cp is None:
+            cell_cp = properties[id(value[2])] = (value[2],
+                                                  _JSonProperties(value[2]))
+          cell_obj["p"] = cell_cp[1]
+        return cell_obj
+      if convert is not None:
+        value = convert(value)
+      return {"v": value}
+
+    plain_types = _PLAIN_TYPES[value_type]
+    if convert is None:
+      def ConvertPlain(value):
+        if type(value) in plain_types:
+          return {"v": value}
+        return ConvertCell(value)
+    elif value_type == "number":
+      def ConvertPlain(value):
+        if type(value) is int or (type(value) is float and
+                                  _IsOrjsonFloat(value)):
+          return {"v": value}
+        return ConvertCell(value)
+    else:
+      def ConvertPlain(value):
+        if type(value) in plain_types:
+          return {"v": convert(value)}
+        return ConvertCell(value)
+    return ConvertPlain
+
   @staticmethod
   def ColumnTypeParser(description):
     """Parses a single column description. Internal helper method.
@@ -533,9 +1633,178 @@ class DataTable(object):
     """Returns the parsed table description."""
     return self.__columns
 
+  @property
+  def version(self):
+    """Returns a token identifying the current version of the table's rows.
+
+    The token changes with every AppendData(), LoadData() and
+    SetRowsCustomProperties() call. It can be passed back as the
+    since_version of ToJSonResponse() to get only the rows appended since,
+    for one of the last _DELTA_VERSIONS versions.
+    """
+    return "%s.%d" % (self.__version_epoch, self.__snapshot[2])
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["_DataTable__lock"]
+    return state
+
+  def __setstate__(self, state):
+    image = state.pop("_DataTable__image", None)
+    self.__dict__.update(state)
+    self.__lock = threading.Lock()
+    if image is not None:
+      header, buffers = self._ReadBinary(zlib.decompress(image))
+      rows = list(_ColumnarRows(header, buffers))
+      self._InternStrings(rows, self.__dictionaries)
+      self.__snapshot = (rows,) + self.__snapshot[1:]
+
+  def __copy__(self):
+    table = self.__class__.__new__(self.__class__)
+    table.__setstate__(self.__getstate__())
+    return table
+
+  def __reduce_ex__(self, protocol):
+    """Pickles the table, with its rows in the binary format if compact.
+
+    If self.compact_pickle is set, the rows are stored column by column and
+    compressed as by ToBinary(), which is much smaller than pickling them,
+    but slower to pickle and unpickle (especially with formatted values).
+    As with FromBinary(), the values of the unpickled table are then coerced
+    to the types of their columns, and the custom properties are as read
+    back from JSON. Other tables, and those the binary format cannot hold,
+    such as tables with timezone aware values, are pickled as usual.
+    """
+    if not self.compact_pickle:
+      return object.__reduce_ex__(self, protocol)
+    try:
+      image = self._BinaryImage()
+    except (DataTableException, TypeError, ValueError):
+      return object.__reduce_ex__(self, protocol)
+    state = self.__getstate__()
+    unused_rows, num_rows, version, rows_at_version = self.__snapshot
+    state["_DataTable__snapshot"] = (None, num_rows, version, rows_at_version)
+    state["_DataTable__image"] = zlib.compress(image, _PICKLE_COMPRESSION)
+    # Caches are dropped, and dictionaries refilled by the rows read back.
+    state["_DataTable__encoded_rows"] = {}
+    state["_DataTable__deflated_rows"] = {}
+    state["_DataTable__dictionaries"] = dict(
+        [(col_id, _ColumnDictionary()) for col_id in self.__dictionaries])
+    return _NewDataTable, (self.__class__,), state
+
+  def _Publish(self, rows, appended):
+    """Publishes the given rows as a new version of the table's rows.
+
+    Must be called with self.__lock held.
+
+    Args:
+      rows: The list of the rows. If appended, the list of the current
+            snapshot, with the new rows appended at its end.
+      appended: Whether the rows were only appended to since the previous
+                version. If not, older versions can no longer be answered
+                with the rows appended since.
+    """
+    unused_rows, unused_num_rows, version, rows_at_version = self.__snapshot
+    version += 1
+    if appended:
+      # Readers of older snapshots ignore the versions newer than theirs.
+      # The versions since the last reset are consecutive, so the oldest one
+      # kept is dropped.
+      rows_at_version[version] = len(rows)
+      rows_at_version.pop(version - _DELTA_VERSIONS, None)
+    else:
+      rows_at_version = {version: len(rows)}
+    self.__snapshot = (rows, len(rows), version, rows_at_version)
+
+  def _Rows(self):
+    """Returns a list of the current rows, unaffected by later changes."""
+    rows, num_rows = self.__snapshot[:2]
+    return rows[:num_rows]
+
+  def _Part(self):
+    """Returns a copy of the table without rows, to serialize rows with."""
+    part = copy.copy(self)
+    part.__snapshot = ([], 0, 0, {0: 0})
+    part.__cache_encoded_rows = False
+    part.__encoded_rows = {}
+    part.__deflated_rows = {}
+    part.stats = None
+    part.compact_pickle = False
+    return part
+
+  def _MapParts(self, workers, rows, method, *args):
+    """Serializes consecutive parts of the given rows in parallel.
+
+    Every part is serialized by calling the given method of a copy of the
+    table without rows, with the part's rows and args, in a worker of a
+    concurrent.futures executor. The processes started for a number of
+    workers are forked with the table and rows where possible, so that only
+    the bounds of each part and the results are pickled. Otherwise, and with
+    process pool executors, the table copy, the rows of each part and the
+    args are pickled, so the values, custom properties and args must be
+    picklable.
+
+    Args:
+      workers: The number of worker processes to start for this call, or an
+               executor to run the parts with.
+      rows: The rows to serialize.
+      method: The name of the method serializing rows.
+      *args: The other arguments of the method.
+
+    Returns:
+      The list of the method's results for the parts, in order, or None if
+      there are fewer than _PARALLEL_MIN_ROWS rows, or no more than one
+      worker (in which case the caller serializes the rows itself).
+    """
+    if not workers or len(rows) < _PARALLEL_MIN_ROWS:
+      return None
+    executor = workers
+    table = self._Part()
+    starts = range(0, len(rows), _PARALLEL_PART_ROWS)
+    if isinstance(workers, numbers.Integral):
+      if workers == 1 or futures is None:
+        return None
+      if _FORK_CONTEXT is not None:
+        executor = futures.ProcessPoolExecutor(
+            workers, mp_context=_FORK_CONTEXT, initializer=_InitPartWorker,
+            initargs=(table, rows))
+        try:
+          return list(executor.map(
+              _SerializeRange, [method] * len(starts), [args] * len(starts),
+              starts, [start + _PARALLEL_PART_ROWS for start in starts]))
+        finally:
+          executor.shutdown()
+      executor = futures.ProcessPoolExecutor(workers)
+    try:
+      return list(executor.map(
+          _SerializePart, [table] * len(starts), [method] * len(starts),
+          [list(rows[start:start + _PARALLEL_PART_ROWS]) for start in starts],
+          [args] * len(starts)))
+    finally:
+      if executor is not workers:
+        executor.shutdown()
+
+  def _RowsAtVersion(self, version, snapshot):
+    """Returns the number of rows a snapshot had at the given version token.
+
+    Args:
+      version: A token returned by the version property.
+      snapshot: The snapshot of the rows to look the version up in.
+
+    Returns:
+      The number of rows, or None if the token is not one of this table, is
+      newer than the snapshot or rows were changed since by anything else than
+      appending.
+    """
+    epoch, unused_sep, number = str(version).rpartition(".")
+    if (epoch != self.__version_epoch or not number.isdigit() or
+        int(number) > snapshot[2]):
+      return None
+    return snapshot[3].get(int(number))
+
   def NumberOfRows(self):
     """Returns the number of rows in the current data stored in the table."""
-    return len(self.__data)
+    return self.__snapshot[1]
 
   def SetRowsCustomProperties(self, rows, custom_properties):
     """Sets the custom properties for given row(s).
@@ -550,8 +1819,123 @@ class DataTable(object):
     """
     if not hasattr(rows, "__iter__"):
       rows = [rows]
-    for row in rows:
-      self.__data[row] = (self.__data[row][0], custom_properties)
+    with self.__lock:
+      # The rows of the published list must not change, so a new one is made.
+      data = list(self._Rows())
+      for row in rows:
+        data[row] = (data[row][0], custom_properties)
+      self.__encoded_rows = {}
+      self.__deflated_rows = {}
+      self._Publish(data, appended=False)
+
+  def SetColumnFormatter(self, column_id, formatter):
+    """Sets how the values of a column are formatted.
+
+    Instead of giving the formatted value of every cell in a (value,
+    formatted value) tuple, the formatted values of a column can be computed
+    from its values as the table is written. Cells given a formatted value
+    keep it. As with formatted values of cells, JSON, JS code and HTML show
+    them for all columns, and CSV only for date/time columns.
+
+    Args:
+      column_id: The ID of the column.
+      formatter: A function from a non-null value of the column (coerced to
+                 its type) to its formatted string, or a pattern: a
+                 str.format() pattern such as "${:,.2f}" for number, string
+                 and boolean columns, or a strftime() pattern such as
+                 "%d/%m/%Y" for date/time columns. None stops formatting the
+                 column. Functions must be picklable for the table to be.
+
+    Raises:
+      DataTableException: The column does not exist, or the formatter is not
+                          a pattern or a function.
+    """
+    col_dict = dict([(col["id"], col) for col in self.__columns])
+    if column_id not in col_dict:
+      raise DataTableException("Unknown column '%s'" % column_id)
+    column_formatter = None
+    if formatter is not None:
+      column_formatter = _ColumnFormatter(formatter,
+                                          col_dict[column_id]["type"])
+    with self.__lock:
+      if column_formatter is None:
+        self.__formatters.pop(column_id, None)
+      else:
+        self.__formatters[column_id] = column_formatter
+      self.__encoded_rows = {}
+      self.__deflated_rows = {}
+      if column_id in self.__dictionaries:
+        self.__dictionaries[column_id].forms = {}
+
+  def SetColumnPrecision(self, column_id, digits):
+    """Sets the number of decimal digits of the values of a number column.
+
+    Floats are written rounded by round(value, digits) in JSON, JS code,
+    HTML and CSV, and formatted (see SetColumnFormatter()) once rounded.
+    Integers and the binary output are not affected.
+
+    Args:
+      column_id: The ID of a number column.
+      digits: The number of digits after the decimal point (negative numbers
+              round to tens, hundreds, etc.), or None to write the values in
+              full precision.
+
+    Raises:
+      DataTableException: The column is not a number column, or digits is
+                          not an integer.
+    """
+    col_dict = dict([(col["id"], col) for col in self.__columns])
+    if col_dict.get(column_id, {}).get("type") != "number":
+      raise DataTableException("Unknown number column '%s'" % column_id)
+    if digits is not None and (not isinstance(digits, numbers.Integral) or
+                               isinstance(digits, bool)):
+      raise DataTableException("Expected an integer precision, given %s." %
+                               type(digits))
+    with self.__lock:
+      if digits is None:
+        self.__precisions.pop(column_id, None)
+      else:
+        self.__precisions[column_id] = int(digits)
+      self.__encoded_rows = {}
+      self.__deflated_rows = {}
+
+  def _CellPreparer(self, col_id, formatted=True):
+    """Returns the function preparing the raw cells of a column for output.
+
+    Args:
+      col_id: The ID of the column.
+      formatted: Optional. Whether the column formatter applies.
+
+    Returns:
+      A function from a raw cell value to the raw cell value to write, with
+      its value rounded to the column precision and the formatted value of
+      the column formatter. None if the cells are written as they are.
+    """
+    digits = self.__precisions.get(col_id)
+    column_formatter = formatted and self.__formatters.get(col_id) or None
+    if column_formatter is None:
+      if digits is None:
+        return None
+      return lambda value: _RoundCell(value, digits)
+    if digits is None:
+      return column_formatter.Cell
+    return lambda value: column_formatter.Cell(_RoundCell(value, digits))
+
+  def _PreparedCells(self, col_id, function, formatted=True):
+    """Returns the function applied to the cells of a column as written.
+
+    Args:
+      col_id: The ID of the column.
+      function: A function from a raw cell value.
+      formatted: Optional. Passed as is to _CellPreparer().
+
+    Returns:
+      The function, applied to the cells prepared by _CellPreparer().
+    """
+    prepare = self._CellPreparer(col_id, formatted)
+    if prepare is None:
+      return function
+    return lambda value: function(prepare(value))
 
   def LoadData(self, data, custom_properties=None):
     """Loads new rows to the data table, clearing existing rows.
@@ -560,13 +1944,26 @@ class DataTable(object):
     properties dictionary specifies the dictionary that will be used for *all*
     given rows.
 
+    The new rows replace the old ones at once, so the table never appears
+    partly loaded, and is left as it was if the data is invalid.
+
     Args:
       data: The rows that the table will contain.
       custom_properties: A dictionary of string to string to set as the custom
                          properties for all rows.
+
+    Raises:
+      DataTableException: The data structure does not match the description.
     """
-    self.__data = []
-    self.AppendData(data, custom_properties)
+    with self.__lock:
+      # The dictionaries start over, to drop the strings of the old rows.
+      dictionaries = dict([(col_id, _ColumnDictionary())
+                           for col_id in self.__dictionaries])
+      rows = self._NewRows(data, custom_properties, dictionaries)
+      self.__encoded_rows = {}
+      self.__deflated_rows = {}
+      self.__dictionaries = dictionaries
+      self._Publish(rows, appended=False)
 
   def AppendData(self, data, custom_properties=None):
     """Appends new data to the table.
@@ -585,17 +1982,132 @@ class DataTable(object):
     Raises:
       DataTableException: The data structure does not match the description.
     """
+    with self.__lock:
+      rows = self._NewRows(data, custom_properties, self.__dictionaries)
+      data = self.__snapshot[0]
+      if not isinstance(data, list):
+        # The rows of an opened table are copied before they can change.
+        data = list(data)
+      data.extend(rows)
+      self._Publish(data, appended=True)
+
+  def _NewRows(self, data, custom_properties, dictionaries):
+    """Returns the list of rows made of the data for LoadData and AppendData.
+
+    The strings of dictionary encoded columns are added to the given
+    dictionaries, which the columns found to hold few distinct values are
+    added to in an "auto" table.
+
+    Must be called with self.__lock held, as it changes the dictionaries.
+    """
+    start = _timer() if self.stats is not None else None
+    rows = []
     # If the maximal depth is 0, we simply iterate over the data table
     # lines and insert them using _InnerAppendData. Otherwise, we simply
     # let the _InnerAppendData handle all the levels.
     if not self.__columns[-1]["depth"]:
       for row in data:
-        self._InnerAppendData(({}, custom_properties), row, 0)
+        self._InnerAppendData(rows, ({}, custom_properties), row, 0)
     else:
-      self._InnerAppendData(({}, custom_properties), data, 0)
+      self._InnerAppendData(rows, ({}, custom_properties), data, 0)
+    if len(rows) >= _DICTIONARY_MIN_ROWS:
+      for col_id in list(self.__auto_dictionary_columns):
+        self.__auto_dictionary_columns.discard(col_id)
+        distinct = set([row.get(col_id) for row, unused_cp in rows
+                        if type(row.get(col_id)) is six.text_type])
+        if len(distinct) <= len(rows) * _DICTIONARY_MAX_RATIO:
+          dictionaries[col_id] = _ColumnDictionary()
+    self._InternStrings(rows, dictionaries)
+    for col in self.__columns:
+      if col["type"] in ("date", "timeofday"):
+        self._NormalizeTemporal(rows, col["id"], col["type"])
+    if start is not None:
+      self.stats.Record("append", _timer() - start, len(rows))
+    return rows
+
+  @staticmethod
+  def _InternStrings(rows, dictionaries):
+    """Replaces the strings of dictionary encoded columns by interned ones."""
+    for col_id, dictionary in list(dictionaries.items()):
+      intern = dictionary.values.setdefault
+      for row, unused_cp in rows:
+        value = row.get(col_id)
+        if type(value) is six.text_type:
+          row[col_id] = intern(value, value)
+
+  @staticmethod
+  def _NormalizeTemporal(rows, col_id, value_type):
+    """Coerces the datetime values of a date or timeofday column once.
+
+    Datetime objects given for a date or timeofday column are replaced by
+    their coerced value as the rows are added, so that serializers find
+    plain values and skip coercing them on every output. Values which do not
+    coerce are left for the serializers to report.
+
+    Args:
+      rows: The new rows.
+      col_id: The ID of a date or timeofday column.
+      value_type: The type of the column.
+    """
+    # As coerced by CoerceValue().
+    coerce = {"date": datetime.datetime.date,
+              "timeofday": lambda value: datetime.time(
+                  value.hour, value.minute, value.second)}[value_type]
+    for row, unused_cp in rows:
+      if type(row.get(col_id)) is datetime.datetime:
+        row[col_id] = coerce(row[col_id])
+
+  def _DictionaryFormatter(self, col_id, form, formatter):
+    """Returns the formatter of a column, memoized if dictionary encoded."""
+    dictionary = self.__dictionaries.get(col_id)
+    if dictionary is None:
+      return formatter
+    return dictionary.Formatter(form, formatter)
+
+  def _TimedConverters(self, converters):
+    """Returns the (column, converter) pairs, timed if stats are collected.
+
+    Returns:
+      A tuple of the pairs and the list whose first item sums the seconds
+      spent in the converters (or None if stats are not collected), to be
+      passed to _RecordConversions().
+    """
+    if self.stats is None:
+      return converters, None
+    total = [0.0]
+    return [(col, _Timed(converter, total))
+            for col, converter in converters], total
+
+  def _RecordConversions(self, total, num_cells):
+    """Records the conversions timed by _TimedConverters().
+
+    The timer is reset, so converters used for several chunks of rows are
+    recorded once per chunk.
+    """
+    if total is not None:
+      self.stats.Record("convert", total[0], num_cells)
+      total[0] = 0.0
+
+  def _Encode(self, encoder, obj):
+    """Returns the object encoded by the encoder, timed if stats are on."""
+    if self.stats is None:
+      return encoder.encode(obj)
+    start = _timer()
+    encoded = encoder.encode(obj)
+    self.stats.Record("encode", _timer() - start)
+    return encoded
+
+  def _RecordOutput(self, output_format, output):
+    """Records the size of an output if stats are collected."""
+    if self.stats is not None:
+      if isinstance(output, six.binary_type):
+        self.stats.RecordOutput(output_format, size=len(output))
+      else:
+        self.stats.RecordOutput(output_format, chars=len(output))
+    return output
 
-  def _InnerAppendData(self, prev_col_values, data, col_index):
-    """Inner function to assist LoadData."""
+  def _InnerAppendData(self, rows, prev_col_values, data, col_index):
+    """Inner function to assist LoadData, appending to the rows list."""
     # We first check that col_index has not exceeded the columns size
     if col_index >= len(self.__columns):
       raise DataTableException("The data does not match description, too deep")
@@ -603,7 +2115,7 @@ class DataTable(object):
     # Dealing with the scalar case, the data is the last value.
     if self.__columns[col_index]["container"] == "scalar":
       prev_col_values[0][self.__columns[col_index]["id"]] = data
-      self.__data.append(prev_col_values)
+      rows.append(prev_col_values)
       return
 
     if self.__columns[col_index]["container"] == "iter":
@@ -617,7 +2129,7 @@ class DataTable(object):
           raise DataTableException("Too many elements given in data")
         prev_col_values[0][self.__columns[col_index]["id"]] = value
         col_index += 1
-      self.__data.append(prev_col_values)
+      rows.append(prev_col_values)
       return
 
     # We know the current level is a dictionary, we verify the type.
@@ -630,22 +2142,22 @@ class DataTable(object):
       for col in self.__columns[col_index:]:
         if col["id"] in data:
           prev_col_values[0][col["id"]] = data[col["id"]]
-      self.__data.append(prev_col_values)
+      rows.append(prev_col_values)
       return
 
     # We have a dictionary in an inner depth level.
     if not data.keys():
       # In case this is an empty dictionary, we add a record with the columns
       # filled only until this point.
-      self.__data.append(prev_col_values)
+      rows.append(prev_col_values)
     else:
       for key in sorted(data):
         col_values = dict(prev_col_values[0])
         col_values[self.__columns[col_index]["id"]] = key
-        self._InnerAppendData((col_values, prev_col_values[1]),
+        self._InnerAppendData(rows, (col_values, prev_col_values[1]),
                               data[key], col_index + 1)
 
-  def _PreparedData(self, order_by=()):
+  def _PreparedData(self, order_by=(), rows=None):
     """Prepares the data for enumeration - sorting it by order_by.
 
     Args:
@@ -656,6 +2168,8 @@ class DataTable(object):
                 ("string_col_name", "asc|desc") -- For a single key.
                 [("col_1","asc|desc"), ("col_2","asc|desc")] -- For more than
                     one column, an array of tuples of (col_name, "asc|desc").
+      rows: Optional. The list of rows to prepare, by default a snapshot of
+            all the rows of the table.
 
     Returns:
       The data sorted by the keys given.
@@ -663,27 +2177,72 @@ class DataTable(object):
     Raises:
       DataTableException: Sort direction not in 'asc' or 'desc'
     """
+    sorted_data = self._Rows() if rows is None else rows
     if not order_by:
-      return self.__data
+      return sorted_data
+    if not isinstance(sorted_data, list):
+      sorted_data = list(sorted_data)
 
-    sorted_data = self.__data[:]
+    start = _timer() if self.stats is not None else None
     if isinstance(order_by, six.string_types) or (
         isinstance(order_by, tuple) and len(order_by) == 2 and
         order_by[1].lower() in ["asc", "desc"]):
       order_by = (order_by,)
-    for key in reversed(order_by):
+    keys = []
+    for key in order_by:
       if isinstance(key, six.string_types):
-        sorted_data.sort(key=lambda x: x[0].get(key))
+        keys.append((key, False))
       elif (isinstance(key, (list, tuple)) and len(key) == 2 and
             key[1].lower() in ("asc", "desc")):
-        key_func = lambda x: x[0].get(key[0])
-        sorted_data.sort(key=key_func, reverse=key[1].lower() != "asc")
+        keys.append((key[0], key[1].lower() != "asc"))
       else:
         raise DataTableException("Expected tuple with second value: "
                                  "'asc' or 'desc'")
 
+    order = self._NumpySortOrder(sorted_data, keys)
+    if order is not None:
+      sorted_data = list(map(sorted_data.__getitem__, order))
+    else:
+      for col_id, reverse in reversed(keys):
+        sorted_data.sort(key=lambda x: x[0].get(col_id), reverse=reverse)
+
+    if start is not None:
+      self.stats.Record("sort", _timer() - start, len(sorted_data))
     return sorted_data
 
+  def _NumpySortOrder(self, rows, keys):
+    """Returns the order of the rows sorted by the keys, computed by numpy.
+
+    Args:
+      rows: The list of rows to sort.
+      keys: The list of (column ID, reverse) tuples to sort by, the first
+            being the primary key.
+
+    Returns:
+      The list of the indices of the rows in the order the stable sorts of
+      _PreparedData() give, or None if numpy is not installed, there is a
+      single key, the rows are few or a key column cannot be sorted by numpy,
+      see _NumpySortKey().
+    """
+    # A single list.sort() is about as fast as converting its key for numpy.
+    if numpy is None or len(keys) < 2 or len(rows) < _NUMPY_SORT_MIN_ROWS:
+      return None
+    col_types = dict([(col["id"], col["type"]) for col in self.__columns])
+    arrays = []
+    # numpy.lexsort() sorts by the last array first.
+    for col_id, reverse in reversed(keys):
+      if col_types.get(col_id) not in ("number", "date", "datetime"):
+        return None
+      array = _NumpySortKey([row[0].get(col_id) for row in rows],
+                            col_types[col_id])
+      if array is None:
+        return None
+      if reverse:
+        # Negated ranks keep equal values in their order, as reverse=True.
+        array = -numpy.unique(array, return_inverse=True)[1]
+      arrays.append(array)
+    return numpy.lexsort(arrays).tolist()
+
   def ToJSCode(self, name, columns_order=None, order_by=()):
     """Writes the data table as a JS code string.
 
@@ -723,7 +2282,7 @@ class DataTable(object):
       DataTableException: The data does not match the type.
     """
 
-    encoder = DataTableJSONEncoder()
+    encoder = _json_encoder_class()
 
     if columns_order is None:
       columns_order = [col["id"] for col in self.__columns]
@@ -733,7 +2292,7 @@ class DataTable(object):
     jscode = "var %s = new google.visualization.DataTable();\n" % name
     if self.custom_properties:
       jscode += "%s.setTableProperties(%s);\n" % (
-          name, encoder.encode(self.custom_properties))
+          name, encoder.encode(_JSonProperties(self.custom_properties)))
 
     # We add the columns to the table
     for i, col in enumerate(columns_order):
@@ -744,32 +2303,135 @@ class DataTable(object):
           encoder.encode(col_dict[col]["id"]))
       if col_dict[col]["custom_properties"]:
         jscode += "%s.setColumnProperties(%d, %s);\n" % (
-            name, i, encoder.encode(col_dict[col]["custom_properties"]))
-    jscode += "%s.addRows(%d);\n" % (name, len(self.__data))
+            name, i,
+            encoder.encode(_JSonProperties(col_dict[col]["custom_properties"])))
+    data = self._PreparedData(order_by)
+    jscode += "%s.addRows(%d);\n" % (name, len(data))
+
+    # Custom properties are usually shared by many rows and cells, each
+    # distinct dictionary is encoded once.
+    encoded_cps = {}
+
+    def EncodeProperties(cp):
+      if id(cp) not in encoded_cps:
+        encoded_cps[id(cp)] = (cp, encoder.encode(_JSonProperties(cp)))
+      return encoded_cps[id(cp)][1]
+
+    literals = dict([(col, _LiteralCache(
+        lambda value: self.EscapeForJSCode(encoder, value)).Format)
+                     for col in columns_order
+                     if col_dict[col]["type"] in ("date", "datetime",
+                                                  "timeofday")])
+    for col in columns_order:
+      if col in self.__dictionaries:
+        literals[col] = self._DictionaryFormatter(
+            col, "jscode", lambda value: self.EscapeForJSCode(encoder, value))
+
+    preparers = dict([(col, self._CellPreparer(col))
+                      for col in columns_order])
 
     # We now go over the data and add each row
-    for (i, (row, cp)) in enumerate(self._PreparedData(order_by)):
+    for (i, (row, cp)) in enumerate(data):
       # We add all the elements of this row by their order
       for (j, col) in enumerate(columns_order):
         if col not in row or row[col] is None:
           continue
-        value = self.CoerceValue(row[col], col_dict[col]["type"])
+        cell = row[col]
+        if preparers[col] is not None:
+          cell = preparers[col](cell)
+        value = self.CoerceValue(cell, col_dict[col]["type"])
         if isinstance(value, tuple):
           cell_cp = ""
           if len(value) == 3:
-            cell_cp = ", %s" % encoder.encode(row[col][2])
+            cell_cp = ", %s" % EncodeProperties(value[2])
           # We have a formatted value or custom property as well
           jscode += ("%s.setCell(%d, %d, %s, %s%s);\n" %
                      (name, i, j,
                       self.EscapeForJSCode(encoder, value[0]),
                       self.EscapeForJSCode(encoder, value[1]), cell_cp))
+        elif col in literals:
+          jscode += "%s.setCell(%d, %d, %s);\n" % (
+              name, i, j, literals[col](value))
         else:
           jscode += "%s.setCell(%d, %d, %s);\n" % (
               name, i, j, self.EscapeForJSCode(encoder, value))
       if cp:
         jscode += "%s.setRowProperties(%d, %s);\n" % (
-            name, i, encoder.encode(cp))
-    return jscode
+            name, i, EncodeProperties(cp))
+    return self._RecordOutput("jscode", jscode)
+
+  def IterHtml(self, columns_order=None, order_by=()):
+    """Yields the data table as an HTML table, one chunk of rows at a time.
+
+    The first chunk holds the document start and the table header. Every
+    following chunk holds up to _CHUNK_ROWS rows, and the last one closes the
+    document.
+
+    Args:
+      columns_order: Optional. Specifies the order of columns in the
+                     output table. Specify a list of all column IDs in the order
+                     in which you want the table created.
+                     Note that you must list all column IDs in this parameter,
+                     if you use it.
+      order_by: Optional. Specifies the name of the column(s) to sort by.
+                Passed as is to _PreparedData.
+
+    Yields:
+      Strings which, when concatenated, are the HTML returned by ToHtml().
+
+    Raises:
+      DataTableException: The data does not match the type.
+    """
+    columns_template = "<thead><tr>%s</tr></thead>"
+    row_template = "<tr>%s</tr>"
+    header_cell_template = "<th>%s</th>"
+    cell_template = "<td>%s</td>"
+
+    if columns_order is None:
+      columns_order = [col["id"] for col in self.__columns]
+    col_dict = dict([(col["id"], col) for col in self.__columns])
+
+    columns_list = []
+    for col in columns_order:
+      columns_list.append(header_cell_template %
+                          html.escape(col_dict[col]["label"]))
+    yield ("<html><body><table border=\"1\">" +
+           columns_template % "".join(columns_list) + "<tbody>")
+
+    formatters, convert_time = self._TimedConverters(
+        [(col, self._DictionaryFormatter(
+            col, "html", self._PreparedCells(
+                col, self._HtmlFormatter(col_dict[col]["type"]))))
+         for col in columns_order])
+
+    # We now go over the data and add the rows, a chunk at a time
+    data = self._PreparedData(order_by)
+    for start in range(0, len(data), _CHUNK_ROWS):
+      yield "".join([
+          row_template % "".join([cell_template % formatter(row.get(col))
+                                  for col, formatter in formatters])
+          for row, unused_cp in data[start:start + _CHUNK_ROWS]])
+    self._RecordConversions(convert_time, len(data) * len(formatters))
+
+    yield "</tbody></table></body></html>"
+
+  def WriteHtml(self, fp, columns_order=None, order_by=(), encoding=None):
+    """Writes the data table as an HTML table into a file-like object.
+
+    Args:
+      fp: A file-like object with a write() method.
+      columns_order: Delegated to IterHtml.
+      order_by: Delegated to IterHtml.
+      encoding: Optional. If given, the HTML text is encoded with it before
+                being written, for use with binary file objects.
+
+    Raises:
+      DataTableException: The data does not match the type.
+    """
+    for chunk in self.IterHtml(columns_order, order_by):
+      if encoding is not None:
+        chunk = chunk.encode(encoding)
+      fp.write(chunk)
 
   def ToHtml(self, columns_order=None, order_by=()):
     """Writes the data table as an HTML table code string.
@@ -797,44 +2459,109 @@ class DataTable(object):
     Raises:
       DataTableException: The data does not match the type.
     """
-    table_template = "<html><body><table border=\"1\">%s</table></body></html>"
-    columns_template = "<thead><tr>%s</tr></thead>"
-    rows_template = "<tbody>%s</tbody>"
-    row_template = "<tr>%s</tr>"
-    header_cell_template = "<th>%s</th>"
-    cell_template = "<td>%s</td>"
+    return self._RecordOutput("html",
+                              "".join(self.IterHtml(columns_order, order_by)))
+
+  def IterCsv(self, columns_order=None, order_by=(), separator=","):
+    """Yields the data table as CSV, one chunk of rows at a time.
+
+    The first chunk holds the header line. Every following chunk holds up to
+    _CHUNK_ROWS rows, so the whole CSV is never held in memory at once. This
+    is suitable for streaming responses, e.g. as a WSGI response iterable.
+
+    Args:
+      columns_order: Optional. Specifies the order of columns in the
+                     output table. Specify a list of all column IDs in the order
+                     in which you want the table created.
+                     Note that you must list all column IDs in this parameter,
+                     if you use it.
+      order_by: Optional. Specifies the name of the column(s) to sort by.
+                Passed as is to _PreparedData.
+      separator: Optional. The separator to use between the values.
+
+    Yields:
+      Strings which, when concatenated, are the CSV returned by ToCsv().
+
+    Raises:
+      DataTableException: The data does not match the type.
+    """
 
     if columns_order is None:
       columns_order = [col["id"] for col in self.__columns]
     col_dict = dict([(col["id"], col) for col in self.__columns])
 
-    columns_list = []
-    for col in columns_order:
-      columns_list.append(header_cell_template %
-                          html.escape(col_dict[col]["label"]))
-    columns_html = columns_template % "".join(columns_list)
+    csv_buffer = six.StringIO()
+    writer = csv.writer(csv_buffer, delimiter=separator)
+    writer.writerow([self._EnsureStr(col_dict[col]["label"])
+                     for col in columns_order])
+    yield csv_buffer.getvalue()
 
-    rows_list = []
-    # We now go over the data and add each row
-    for row, unused_cp in self._PreparedData(order_by):
-      cells_list = []
-      # We add all the elements of this row by their order
-      for col in columns_order:
-        # For empty string we want empty quotes ("").
-        value = ""
-        if col in row and row[col] is not None:
-          value = self.CoerceValue(row[col], col_dict[col]["type"])
-        if isinstance(value, tuple):
-          # We have a formatted value and we're going to use it
-          cells_list.append(cell_template % html.escape(self.ToString(value[1])))
-        else:
-          cells_list.append(cell_template % html.escape(self.ToString(value)))
-      rows_list.append(row_template % "".join(cells_list))
-    rows_html = rows_template % "".join(rows_list)
+    # We now go over the data and add the rows, a chunk at a time
+    data = self._PreparedData(order_by)
+    formatters = self._CsvFormatters(columns_order)
+    for start in range(0, len(data), _CHUNK_ROWS):
+      yield self._CsvRows(data[start:start + _CHUNK_ROWS], columns_order,
+                          separator, formatters)
 
-    return table_template % (columns_html + rows_html)
+  def _CsvFormatters(self, columns_order):
+    """Returns the formatters of the CSV cells, as _TimedConverters() does."""
+    col_dict = dict([(col["id"], col) for col in self.__columns])
+    # Only the formatted values of date/time columns are written.
+    return self._TimedConverters(
+        [(col, self._PreparedCells(
+            col, self._CsvFormatter(col_dict[col]["type"]),
+            formatted=col_dict[col]["type"] in ("date", "datetime",
+                                                "timeofday")))
+         for col in columns_order])
 
-  def ToCsv(self, columns_order=None, order_by=(), separator=","):
+  def _CsvRows(self, rows, columns_order, separator, formatters=None):
+    """Returns the CSV lines of the given rows.
+
+    Args:
+      rows: The (row, custom properties) pairs to write.
+      columns_order: The IDs of the columns to write, in order.
+      separator: The separator to use between the values.
+      formatters: Optional. The result of _CsvFormatters(), to reuse the
+                  formatters and their memos across chunks of rows. Built
+                  for these rows only if not given.
+    """
+    if formatters is None:
+      formatters = self._CsvFormatters(columns_order)
+    formatters, convert_time = formatters
+    csv_buffer = six.StringIO()
+    writer = csv.writer(csv_buffer, delimiter=separator)
+    writer.writerows([[formatter(row.get(col)) for col, formatter in formatters]
+                      for row, unused_cp in rows])
+    self._RecordConversions(convert_time, len(rows) * len(formatters))
+    return csv_buffer.getvalue()
+
+  def WriteCsv(self, fp, columns_order=None, order_by=(), separator=",",
+               encoding=None):
+    """Writes the data table as CSV into a file-like object.
+
+    The rows are written in chunks as they are serialized, so memory usage
+    does not grow with the size of the table.
+
+    Args:
+      fp: A file-like object with a write() method.
+      columns_order: Delegated to IterCsv.
+      order_by: Delegated to IterCsv.
+      separator: Delegated to IterCsv.
+      encoding: Optional. If given, the CSV text is encoded with it before
+                being written, for use with binary file objects.
+
+    Raises:
+      DataTableException: The data does not match the type.
+    """
+    for chunk in self.IterCsv(columns_order, order_by, separator):
+      if encoding is not None:
+        if not isinstance(chunk, six.text_type):
+          chunk = chunk.decode("utf-8")
+        chunk = chunk.encode(encoding)
+      fp.write(chunk)
+
+  def ToCsv(self, columns_order=None, order_by=(), separator=",",
+            workers=None):
     """Writes the data table as a CSV string.
 
     Output is encoded in UTF-8 because the Python "csv" module can't handle
@@ -849,6 +2576,9 @@ class DataTable(object):
       order_by: Optional. Specifies the name of the column(s) to sort by.
                 Passed as is to _PreparedData.
       separator: Optional. The separator to use between the values.
+      workers: Optional. The number of processes, or a concurrent.futures
+               executor, to serialize large tables with in parallel. See
+               _MapParts().
 
     Returns:
       A CSV string representing the table.
@@ -860,41 +2590,56 @@ class DataTable(object):
     Raises:
       DataTableException: The data does not match the type.
     """
+    chunks = self.IterCsv(columns_order, order_by, separator)
+    if not workers:
+      return self._RecordOutput("csv", "".join(chunks))
 
-    csv_buffer = six.StringIO()
-    writer = csv.writer(csv_buffer, delimiter=separator)
-
+    # The first chunk of IterCsv() is the header.
+    header = next(chunks)
     if columns_order is None:
       columns_order = [col["id"] for col in self.__columns]
-    col_dict = dict([(col["id"], col) for col in self.__columns])
+    data = self._PreparedData(order_by)
+    parts = self._MapParts(workers, data, "_CsvRows", columns_order, separator)
+    if parts is None:
+      parts = [self._CsvRows(data, columns_order, separator,
+                             self._CsvFormatters(columns_order))]
+    return self._RecordOutput("csv", "".join([header] + parts))
 
-    def ensure_str(s):
-      "Compatibility function. Ensures using of str rather than unicode."
-      if isinstance(s, str):
-        return s
-      return s.encode("utf-8")
+  def WriteTsvExcel(self, fp, columns_order=None, order_by=(), bom=False):
+    """Writes the table in tab-separated-format readable by MS Excel.
 
-    writer.writerow([ensure_str(col_dict[col]["label"])
-                     for col in columns_order])
+    The output is encoded incrementally in UTF-16 little endian and written
+    into the given binary file-like object chunk by chunk.
 
-    # We now go over the data and add each row
-    for row, unused_cp in self._PreparedData(order_by):
-      cells_list = []
-      # We add all the elements of this row by their order
-      for col in columns_order:
-        value = ""
-        if col in row and row[col] is not None:
-          value = self.CoerceValue(row[col], col_dict[col]["type"])
-        if isinstance(value, tuple):
-          # We have a formatted value. Using it only for date/time types.
-          if col_dict[col]["type"] in ["date", "datetime", "timeofday"]:
-            cells_list.append(ensure_str(self.ToString(value[1])))
-          else:
-            cells_list.append(ensure_str(self.ToString(value[0])))
-        else:
-          cells_list.append(ensure_str(self.ToString(value)))
-      writer.writerow(cells_list)
-    return csv_buffer.getvalue()
+    Args:
+      fp: A binary file-like object with a write() method.
+      columns_order: Delegated to IterTsvExcel.
+      order_by: Delegated to IterTsvExcel.
+      bom: Optional. If True, a UTF-16LE byte order mark is written first.
+    """
+    for chunk in self.IterTsvExcel(columns_order, order_by, bom):
+      fp.write(chunk)
+
+  def IterTsvExcel(self, columns_order=None, order_by=(), bom=False):
+    """Yields the table in tab-separated-format readable by MS Excel.
+
+    Args:
+      columns_order: Delegated to IterCsv.
+      order_by: Delegated to IterCsv.
+      bom: Optional. If True, a UTF-16LE byte order mark is yielded first.
+
+    Yields:
+      Byte strings which, when concatenated, are the file returned by
+      ToTsvExcel().
+    """
+    encoder = codecs.getincrementalencoder("UTF-16LE")()
+    if bom:
+      yield codecs.BOM_UTF16_LE
+    for chunk in self.IterCsv(columns_order, order_by, separator="\t"):
+      if not isinstance(chunk, six.text_type):
+        chunk = chunk.decode("utf-8")
+      yield encoder.encode(chunk)
+    yield encoder.encode(u"", final=True)
 
   def ToTsvExcel(self, columns_order=None, order_by=()):
     """Returns a file in tab-separated-format readable by MS Excel.
@@ -909,12 +2654,617 @@ class DataTable(object):
     Returns:
       A tab-separated little endian UTF16 file representing the table.
     """
-    csv_result = self.ToCsv(columns_order, order_by, separator="\t")
-    if not isinstance(csv_result, six.text_type):
-      csv_result = csv_result.decode("utf-8")
-    return csv_result.encode("UTF-16LE")
+    return self._RecordOutput("tsv-excel", self._JoinBytes(
+        self.IterTsvExcel(columns_order, order_by)))
+
+  @staticmethod
+  def _EncodeColumn(value_type, values):
+    """Encodes the coerced values of a column into typed buffers.
+
+    Internal helper method for ToBinary().
+
+    Args:
+      value_type: The type of the column.
+      values: The list of coerced values of the column, None for null cells.
+
+    Returns:
+      A tuple of the name of the encoding used and the list of buffers (bytes)
+      holding the values. Null cells hold zeros in fixed width buffers.
+
+    Raises:
+      DataTableException: A date/time value is timezone aware.
+    """
+    if value_type == "boolean":
+      bits = bytearray((len(values) + 7) // 8)
+      for i, value in enumerate(values):
+        if value:
+          bits[i >> 3] |= 1 << (i & 7)
+      return "bitmap", [bytes(bits)]
+
+    if value_type == "string":
+      codes = {}
+      for value in values:
+        if value is not None and value not in codes:
+          codes[value] = len(codes)
+      # Columns repeating their strings store each distinct one once, and a
+      # 32-bit code per row.
+      encoding = "utf8"
+      strings = values
+      prefix = []
+      if len(codes) * 2 <= len(values):
+        encoding = "dictionary"
+        strings = sorted(codes, key=codes.get)
+        prefix = [DataTable._ArrayToBytes(array.array(
+            "i", [0 if value is None else codes[value] for value in values]))]
+      blobs = [b"" if value is None else
+               value.encode("utf-8", "surrogatepass") for value in strings]
+      offsets = array.array("q", [0])
+      total = 0
+      for blob in blobs:
+        total += len(blob)
+        offsets.append(total)
+      return encoding, prefix + [DataTable._ArrayToBytes(offsets),
+                                 b"".join(blobs)]
+
+    for value in values:
+      if getattr(value, "tzinfo", None) is not None:
+        raise DataTableException(
+            "Timezone aware values are not supported in binary output, "
+            "given %s." % value)
+
+    if value_type == "number":
+      present = [value for value in values if value is not None]
+      if all(type(value) is int and -2**63 <= value < 2**63
+             for value in present):
+        return "int64", [DataTable._ArrayToBytes(
+            array.array("q", [value or 0 for value in values]))]
+      if all(type(value) is float for value in present):
+        return "float64", [DataTable._ArrayToBytes(
+            array.array("d", [value or 0. for value in values]))]
+      # Mixed integers and floats, or integers too large for 64 bits.
+      return "json", [json.dumps(values, separators=(",", ":")).encode()]
+
+    if value_type == "date":
+      return "days", [DataTable._ArrayToBytes(array.array(
+          "i", [0 if value is None else value.toordinal()
+                for value in values]))]
+
+    if value_type == "datetime":
+      return "microseconds", [DataTable._ArrayToBytes(array.array(
+          "q", [0 if value is None else
+                (value - _DATETIME_ORIGIN) // _MICROSECOND
+                for value in values]))]
+
+    # timeofday
+    return "microseconds", [DataTable._ArrayToBytes(array.array(
+        "q", [0 if value is None else
+              (value.hour * 3600 + value.minute * 60 + value.second) *
+              1000000 + value.microsecond for value in values]))]
+
+  @staticmethod
+  def _DecodeColumn(value_type, encoding, num_rows, buffers):
+    """Decodes the typed buffers of a column written by _EncodeColumn().
+
+    Internal helper method for FromBinary().
+
+    Args:
+      value_type: The type of the column.
+      encoding: The name of the encoding returned by _EncodeColumn().
+      num_rows: The number of values in the column.
+      buffers: The list of buffers (bytes-like objects) of the column.
+
+    Returns:
+      The list of values of the column. Null cells are not distinguished from
+      non-null ones, they are masked by the caller.
+
+    Raises:
+      DataTableException: The encoding is not known.
+    """
+    if encoding == "bitmap":
+      bits = bytearray(buffers[0])
+      return [bool(bits[i >> 3] >> (i & 7) & 1) for i in range(num_rows)]
+
+    if encoding == "utf8":
+      offsets = DataTable._BytesToArray("q", buffers[0])
+      blob = bytes(buffers[1])
+      return [blob[offsets[i]:offsets[i + 1]].decode("utf-8", "surrogatepass")
+              for i in range(num_rows)]
+
+    if encoding == "dictionary":
+      offsets = DataTable._BytesToArray("q", buffers[1])
+      blob = bytes(buffers[2])
+      strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8",
+                                                        "surrogatepass")
+                 for i in range(len(offsets) - 1)]
+      if not strings:
+        return [None] * num_rows
+      return [strings[code] for code in DataTable._BytesToArray("i",
+                                                                buffers[0])]
+
+    if encoding == "json":
+      try:
+        return json.loads(bytes(buffers[0]).decode("utf-8"))
+      except ValueError as e:
+        raise DataTableException("Invalid json column: %s" % e)
+
+    if encoding == "int64":
+      return DataTable._BytesToArray("q", buffers[0]).tolist()
+
+    if encoding == "float64":
+      return DataTable._BytesToArray("d", buffers[0]).tolist()
+
+    if encoding == "days":
+      return [datetime.date.fromordinal(value) if value else None
+              for value in DataTable._BytesToArray("i", buffers[0])]
+
+    if encoding == "microseconds" and value_type == "datetime":
+      return [_DATETIME_ORIGIN + _MICROSECOND * value
+              for value in DataTable._BytesToArray("q", buffers[0])]
+
+    if encoding == "microseconds" and value_type == "timeofday":
+      values = []
+      for value in DataTable._BytesToArray("q", buffers[0]):
+        seconds, microsecond = divmod(value, 1000000)
+        minutes, second = divmod(seconds, 60)
+        hour, minute = divmod(minutes, 60)
+        values.append(datetime.time(hour, minute, second, microsecond))
+      return values
+
+    raise DataTableException("Unsupported encoding '%s' for type %s" %
+                             (encoding, value_type))
+
+  @staticmethod
+  def _ArrayToBytes(values):
+    """Returns the little endian bytes of an array.array."""
+    if sys.byteorder == "big":
+      values = array.array(values.typecode, values)
+      values.byteswap()
+    return values.tobytes()
+
+  @staticmethod
+  def _BytesToArray(typecode, buf):
+    """Returns an array.array read from little endian bytes."""
+    values = array.array(typecode)
+    values.frombytes(buf)
+    if sys.byteorder == "big":
+      values.byteswap()
+    return values
+
+  def ToBinary(self, columns_order=None, order_by=()):
+    """Writes the data table in a compact, self-describing binary format.
+
+    The table is written column by column. Every column is stored as a
+    validity bitmap (bit i is set if the cell in row i is not null) followed
+    by typed buffers of its values: 64-bit integers or floats for numbers,
+    packed bits for booleans, UTF-8 bytes with 64-bit offsets for strings
+    (preceded by 32-bit codes into the distinct strings if they repeat),
+    and day or microsecond counts for dates and times. The schema, the custom
+    properties and the formatted values are kept in a JSON header. All
+    numbers are little endian and every buffer is 8-byte aligned.
+
+    This format is meant for services consuming a data source, for which it
+    is much cheaper to produce and parse than JSON. Use FromBinary() to read
+    it back into a DataTable.
+
+    Args:
+      columns_order: Optional. Specifies the order of columns in the
+                     output table. Specify a list of all column IDs in the order
+                     in which you want the table created.
+                     Note that you must list all column IDs in this parameter,
+                     if you use it.
+      order_by: Optional. Specifies the name of the column(s) to sort by.
+                Passed as is to _PreparedData.
+
+    Returns:
+      A bytes object holding the binary image of the table.
+
+    Raises:
+      DataTableException: The data does not match the type, or holds timezone
+                          aware date/time values.
+    """
+    return self._RecordOutput("binary",
+                              self._BinaryImage(columns_order, order_by))
+
+  def _BinaryImage(self, columns_order=None, order_by=()):
+    """Returns the binary image of the table, as ToBinary()."""
+    if columns_order is None:
+      columns = self.__columns
+    else:
+      # A reordered table description can only be kept as a flat list.
+      col_dict = dict([(col["id"], col) for col in self.__columns])
+      columns = [dict(col_dict[col], depth=0, container="iter")
+                 for col in columns_order]
+
+    data = self._PreparedData(order_by)
+    num_rows = len(data)
+
+    # Row custom properties are usually shared by many rows, we store every
+    # distinct dictionary once.
+    row_cps = []
+    row_cp_index = []
+    row_cp_ids = {}
+    for i, (unused_row, cp) in enumerate(data):
+      if cp:
+        if id(cp) not in row_cp_ids:
+          row_cp_ids[id(cp)] = len(row_cps)
+          row_cps.append(cp)
+        row_cp_index.append([i, row_cp_ids[id(cp)]])
+
+    buffers = []
+    buffers_size = [0]
+
+    def AddBuffer(buf):
+      offset = buffers_size[0]
+      padding = -len(buf) % 8
+      buffers.append(buf)
+      buffers.append(b"\0" * padding)
+      buffers_size[0] += len(buf) + padding
+      return [offset, len(buf)]
+
+    column_headers = []
+    for col in columns:
+      col_id = col["id"]
+      values = [row.get(col_id) for row, unused_cp in data]
+      extras = []
+      plain_types = _PLAIN_TYPES[col["type"]]
+      for i in [i for i, value in enumerate(values)
+                if value is not None and type(value) not in plain_types]:
+        value = self.CoerceValue(values[i], col["type"])
+        if isinstance(value, tuple):
+          # Formatted values and cell custom properties are kept as is.
+          extras.append([i] + list(value[1:]))
+          value = value[0]
+        values[i] = value
+      # The bits of the null cells are cleared from a full bitmap.
+      validity = bytearray(b"\xff" * (num_rows // 8))
+      if num_rows % 8:
+        validity.append((1 << num_rows % 8) - 1)
+      for i in [i for i, value in enumerate(values) if value is None]:
+        validity[i >> 3] &= ~(1 << (i & 7))
+      encoding, value_buffers = self._EncodeColumn(col["type"], values)
+      column_header = {
+          "encoding": encoding,
+          "buffers": [AddBuffer(bytes(validity))] +
+                     [AddBuffer(buf) for buf in value_buffers]}
+      if extras:
+        column_header["extras"] = extras
+      column_headers.append(column_header)
+
+    header = {"cols": columns,
+              "rows": num_rows,
+              "p": self.custom_properties,
+              "columns": column_headers,
+              "row_p": row_cps,
+              "row_p_index": row_cp_index}
+    header_bytes = DataTableJSONEncoder().encode(header).encode("utf-8")
+    header_bytes += b" " * (-(_BINARY_PREFIX.size + len(header_bytes)) % 8)
+    return b"".join([_BINARY_PREFIX.pack(_BINARY_MAGIC, _BINARY_VERSION, 0,
+                                         len(header_bytes)), header_bytes] +
+                    buffers)
+
+  @classmethod
+  def FromBinary(cls, data):
+    """Reads a data table from the binary format written by ToBinary().
+
+    The returned table has the same table description, custom properties and
+    rows as the table written, with every value already coerced to the type
+    of its column.
+
+    Args:
+      data: A bytes-like object holding the binary image of the table.
+
+    Returns:
+      A new DataTable.
+
+    Raises:
+      DataTableException: The data is not in a supported binary format.
+    """
+    header, buffers = cls._ReadBinary(data)
+    return cls._FromImage(header, list(_ColumnarRows(header, buffers)))
+
+  def Save(self, path, columns_order=None, order_by=()):
+    """Saves the data table to a file in the format written by ToBinary().
+
+    The file is written under a temporary name and then renamed, so that
+    processes which opened the previous file keep reading it unchanged.
+
+    Args:
+      path: The path of the file.
+      columns_order: Optional. Passed as is to ToBinary().
+      order_by: Optional. Passed as is to ToBinary().
+
+    Raises:
+      DataTableException: The data does not match the type, or holds timezone
+                          aware date/time values.
+    """
+    data = self.ToBinary(columns_order, order_by)
+    temp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+      with open(temp_path, "wb") as f:
+        f.write(data)
+      getattr(os, "replace", os.rename)(temp_path, path)
+    finally:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+  @classmethod
+  def Open(cls, path):
+    """Opens a data table saved by Save(), without loading it into memory.
+
+    The file is memory-mapped read-only, and every serialization decodes the
+    rows it needs from the mapping. Processes opening the same file, such as
+    the workers of a pre-fork server, share its pages. The table can be
+    changed like any other; AppendData() and SetRowsCustomProperties() copy
+    the rows into memory first.
+
+    Args:
+      path: The path of a file written by Save().
+
+    Returns:
+      A new DataTable.
+
+    Raises:
+      DataTableException: The file is not in a supported binary format.
+    """
+    with open(path, "rb") as f:
+      if not os.fstat(f.fileno()).st_size:
+        raise DataTableException("Binary data is too short")
+      mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header, buffers = cls._ReadBinary(mapping)
+    return cls._FromImage(header, _ColumnarRows(header, buffers))
+
+  def ToSharedMemory(self, name, columns_order=None, order_by=()):
+    """Publishes the table in shared memory, to be read by FromSharedMemory().
+
+    The binary image of the table (see ToBinary()) is copied into a new
+    shared memory segment of the next generation of the name, and the
+    generation segment of the name is then updated to point readers to it.
+    The segment of the previous generation published by this process is
+    unlinked, while processes which read it keep it until they drop the
+    table. The segments stay published until UnlinkSharedMemory() is called
+    or this process exits.
+
+    Args:
+      name: The name to publish the table under, a valid shared memory
+            segment name.
+      columns_order: Optional. Passed as is to ToBinary().
+      order_by: Optional. Passed as is to ToBinary().
+
+    Returns:
+      The generation published, increasing with every publication.
+
+    Raises:
+      DataTableException: Shared memory is not available (it requires Python
+                          3.8 or higher), or ToBinary() failed.
+    """
+    if shared_memory is None:
+      raise DataTableException("Shared memory requires Python 3.8 or higher")
+    image = self._BinaryImage(columns_order, order_by)
+    with _published_segments_lock:
+      control, previous = _published_segments.get(name, (None, None))
+      if control is None:
+        try:
+          control = shared_memory.SharedMemory(name, create=True,
+                                               size=_GENERATION.size)
+        except FileExistsError:
+          # Left by an earlier publisher of the name, owned from now on.
+          control = shared_memory.SharedMemory(name)
+      generation = _GENERATION.unpack_from(control.buf)[0] + 1
+      segment = shared_memory.SharedMemory(_SEGMENT_NAME % (name, generation),
+                                           create=True, size=len(image))
+      segment.buf[:len(image)] = image
+      _GENERATION.pack_into(control.buf, 0, generation)
+      _published_segments[name] = (control, segment)
+      if previous is not None:
+        previous.close()
+        previous.unlink()
+    return generation
+
+  @staticmethod
+  def SharedMemoryGeneration(name):
+    """Returns the generation of the table published under a name.
+
+    Readers can call it cheaply to find whether a newer table was published
+    since they called FromSharedMemory().
+
+    Args:
+      name: The name passed to ToSharedMemory().
+
+    Returns:
+      The generation returned by the latest ToSharedMemory() of the name, or
+      0 if the name was never published.
+
+    Raises:
+      DataTableException: Shared memory is not available.
+    """
+    if shared_memory is None:
+      raise DataTableException("Shared memory requires Python 3.8 or higher")
+    try:
+      control = _AttachSharedMemory(name, name)
+    except FileNotFoundError:
+      return 0
+    try:
+      return _GENERATION.unpack_from(control.buf)[0]
+    finally:
+      control.close()
+
+  @classmethod
+  def FromSharedMemory(cls, name, generation=None):
+    """Reads a table published by ToSharedMemory(), without copying it.
+
+    As with Open(), the rows are decoded from the shared segment as they are
+    serialized, so processes reading the same table share its memory.
+
+    Args:
+      name: The name passed to ToSharedMemory().
+      generation: Optional. The generation to read, as returned by
+                  SharedMemoryGeneration(). By default the current one.
+
+    Returns:
+      A new DataTable.
+
+    Raises:
+      DataTableException: Shared memory is not available, or the generation
+                          is not published.
+    """
+    if shared_memory is None:
+      raise DataTableException("Shared memory requires Python 3.8 or higher")
+    current = generation
+    while True:
+      if generation is None:
+        current = cls.SharedMemoryGeneration(name)
+      try:
+        segment = _AttachSharedMemory(_SEGMENT_NAME % (name, current), name)
+        break
+      except FileNotFoundError:
+        # A newer generation may have been published meanwhile.
+        if generation is not None or (
+            cls.SharedMemoryGeneration(name) == current):
+          raise DataTableException(
+              "Generation %d of '%s' is not published" % (current, name))
+    header, buffers = cls._ReadBinary(segment.buf)
+    return cls._FromImage(header, _ColumnarRows(header, buffers, segment))
+
+  @staticmethod
+  def UnlinkSharedMemory(name):
+    """Unlinks the segments of a name published by this process.
+
+    Processes which read the table keep it until they drop it.
+
+    Args:
+      name: The name passed to ToSharedMemory().
+    """
+    with _published_segments_lock:
+      for segment in _published_segments.pop(name, ()):
+        segment.close()
+        segment.unlink()
+
+  @staticmethod
+  def _ReadBinary(data):
+    """Returns the header and the column buffers of a binary image.
+
+    Args:
+      data: A bytes-like object holding the binary image of a table.
+
+    Returns:
+      A tuple of the JSON header, and the list of the buffers (memoryviews
+      of data) of every column, the validity bitmap first.
+
+    Raises:
+      DataTableException: The data is not in a supported binary format.
+    """
+    view = memoryview(data)
+    if len(view) < _BINARY_PREFIX.size:
+      raise DataTableException("Binary data is too short")
+    magic, version, unused_flags, header_length = _BINARY_PREFIX.unpack(
+        view[:_BINARY_PREFIX.size].tobytes())
+    if magic != _BINARY_MAGIC:
+      raise DataTableException("Binary data does not hold a DataTable")
+    if version != _BINARY_VERSION:
+      raise DataTableException(
+          "Binary format version %d is not supported" % version)
+    data_start = _BINARY_PREFIX.size + header_length
+    if data_start > len(view):
+      raise DataTableException("Binary data is truncated")
+    try:
+      header = json.loads(
+          view[_BINARY_PREFIX.size:data_start].tobytes().decode("utf-8"))
+      missing = set(_BINARY_HEADER_KEYS) - set(header)
+      if missing:
+        raise KeyError(", ".join(sorted(missing)))
+      num_rows = header["rows"]
+      if not isinstance(num_rows, six.integer_types) or num_rows < 0:
+        raise ValueError("invalid number of rows %r" % (num_rows,))
+      for col in header["cols"]:
+        missing = set(_BINARY_COLUMN_KEYS) - set(col)
+        if missing:
+          raise KeyError(", ".join(sorted(missing)))
+      for i, cp_index in header["row_p_index"]:
+        if not 0 <= i < num_rows or not 0 <= cp_index < len(header["row_p"]):
+          raise ValueError("row custom properties index out of range")
+      columns = header["columns"]
+      data_size = len(view) - data_start
+      buffers = []
+      for col, column_header in zip(header["cols"], columns):
+        column_buffers = []
+        for offset, length in column_header["buffers"]:
+          if offset < 0 or length < 0 or offset + length > data_size:
+            raise DataTableException("Binary data is truncated")
+          column_buffers.append(
+              view[data_start + offset:data_start + offset + length])
+        DataTable._CheckBuffers(col["type"], column_header["encoding"],
+                                num_rows, column_buffers)
+        for extra in column_header.get("extras", ()):
+          if not 0 <= extra[0] < num_rows:
+            raise ValueError("formatted cell out of range")
+        buffers.append(column_buffers)
+      if len(header["cols"]) != len(columns):
+        raise ValueError("%d columns with %d buffer lists" %
+                         (len(header["cols"]), len(columns)))
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+      raise DataTableException("Invalid binary header: %s" % e)
+    return header, buffers
 
-  def _ToJSonObj(self, columns_order=None, order_by=()):
+  @staticmethod
+  def _CheckBuffers(value_type, encoding, num_rows, buffers):
+    """Checks the sizes of the buffers of a column against its rows.
+
+    Args:
+      value_type: The type of the column.
+      encoding: The name of the encoding of the column.
+      num_rows: The number of rows of the image.
+      buffers: The buffers of the column, the validity bitmap first.
+
+    Raises:
+      DataTableException: The encoding is not known, or the buffers do not
+                          hold num_rows values.
+    """
+    bitmap_size = (num_rows + 7) >> 3
+    if encoding == "bitmap":
+      sizes = [bitmap_size, bitmap_size]
+    elif encoding == "utf8":
+      sizes = [bitmap_size, (num_rows + 1) * 8, None]
+    elif encoding == "dictionary":
+      sizes = [bitmap_size, num_rows * 4, None, None]
+    elif encoding == "json":
+      sizes = [bitmap_size, None]
+    elif encoding == "days" and value_type == "date":
+      sizes = [bitmap_size, num_rows * 4]
+    elif (encoding == "microseconds" and
+          value_type in ("datetime", "timeofday")) or (
+              encoding in ("int64", "float64") and value_type == "number"):
+      sizes = [bitmap_size, num_rows * 8]
+    else:
+      raise DataTableException("Unsupported encoding '%s' for type %s" %
+                               (encoding, value_type))
+    if len(buffers) != len(sizes) or [
+        1 for size, buf in zip(sizes, buffers)
+        if size is not None and len(buf) != size]:
+      raise DataTableException(
+          "The %s buffers of a column do not hold %d rows" %
+          (encoding, num_rows))
+    if encoding in ("utf8", "dictionary"):
+      offsets, blob = buffers[-2:]
+      if (len(offsets) % 8 or len(offsets) < 8 or
+          DataTable._BytesToArray("q", offsets[-8:])[0] != len(blob)):
+        raise DataTableException("The string offsets of a column do not "
+                                 "match its strings")
+
+  @classmethod
+  def _FromImage(cls, header, rows):
+    """Returns a table of the header of a binary image and the given rows."""
+    columns = header["cols"]
+    table = cls([(col["id"], col["type"], col["label"],
+                  col["custom_properties"]) for col in columns],
+                custom_properties=header["p"])
+    # Restoring the parsed description keeps nested descriptions usable by
+    # AppendData().
+    table.__columns = columns
+    with table.__lock:
+      table._Publish(rows, appended=False)
+    return table
+
+  def _ToJSonObj(self, columns_order=None, order_by=(), rows=None):
     """Returns an object suitable to be converted to JSON.
 
     Args:
@@ -923,53 +3273,192 @@ class DataTable(object):
                      all column IDs must be present.
       order_by: Optional. Specifies the name of the column(s) to sort by.
                 Passed as is to _PreparedData().
+      rows: Optional. Passed as is to _PreparedData().
 
     Returns:
       A dictionary object for use by ToJSon or ToJSonResponse.
     """
     if columns_order is None:
       columns_order = [col["id"] for col in self.__columns]
-    col_dict = dict([(col["id"], col) for col in self.__columns])
 
-    # Creating the column JSON objects
+    json_obj = {"cols": self._JSonColumnObjs(columns_order),
+                "rows": self._JSonRowObjs(
+                    self._PreparedData(order_by, rows), columns_order)}
+    if self.custom_properties:
+      json_obj["p"] = _JSonProperties(self.custom_properties)
+
+    return json_obj
+
+  def _JSonColumnObjs(self, columns_order):
+    """Returns the list of column objects of the JSON table."""
+    col_dict = dict([(col["id"], col) for col in self.__columns])
     col_objs = []
     for col_id in columns_order:
       col_obj = {"id": col_dict[col_id]["id"],
                  "label": col_dict[col_id]["label"],
                  "type": col_dict[col_id]["type"]}
       if col_dict[col_id]["custom_properties"]:
-        col_obj["p"] = col_dict[col_id]["custom_properties"]
+        col_obj["p"] = _JSonProperties(col_dict[col_id]["custom_properties"])
       col_objs.append(col_obj)
+    return col_objs
 
-    # Creating the rows jsons
+  def _JSonRowObjs(self, data, columns_order):
+    """Returns the list of row objects of the JSON table for the given rows."""
+    start = _timer() if self.stats is not None else None
+    col_dict = dict([(col["id"], col) for col in self.__columns])
+    converters, convert_time = self._TimedConverters(
+        [(col, self._DictionaryFormatter(
+            col, "json", self._PreparedCells(
+                col, self._JSonCellConverter(col_dict[col]["type"]))))
+         for col in columns_order])
+    # Row custom properties are usually shared by many rows
+    row_cps = {}
     row_objs = []
-    for row, cp in self._PreparedData(order_by):
-      cell_objs = []
-      for col in columns_order:
-        value = self.CoerceValue(row.get(col, None), col_dict[col]["type"])
-        if value is None:
-          cell_obj = None
-        elif isinstance(value, tuple):
-          cell_obj = {"v": value[0]}
-          if len(value) > 1 and value[1] is not None:
-            cell_obj["f"] = value[1]
-          if len(value) == 3:
-            cell_obj["p"] = value[2]
-        else:
-          cell_obj = {"v": value}
-        cell_objs.append(cell_obj)
-      row_obj = {"c": cell_objs}
+    for row, cp in data:
+      row_obj = {"c": [None if row.get(col) is None else
+                       converter(row[col])
+                       for col, converter in converters]}
       if cp:
-        row_obj["p"] = cp
+        if id(cp) not in row_cps:
+          row_cps[id(cp)] = _JSonProperties(cp)
+        row_obj["p"] = row_cps[id(cp)]
       row_objs.append(row_obj)
+    if start is not None:
+      self._RecordConversions(convert_time, len(row_objs) * len(converters))
+      self.stats.Record("build", _timer() - start, len(row_objs))
+    return row_objs
+
+  def _EncodeJSonTable(self, encoder, columns_order=None, order_by=(),
+                       rows=None, workers=None):
+    """Returns the JSON encoding of _ToJSonObj() with the given encoder.
+
+    If the table caches its encoded rows and no order is requested, only the
+    rows appended since the last call are encoded, and the table is assembled
+    from the cached fragments. Rows are encoded by the given workers, see
+    _MapParts(). With orjson, rows are encoded in chunks, see
+    _EncodeJSonRows().
+    """
+    if columns_order is None:
+      columns_order = [col["id"] for col in self.__columns]
+    if not self.__cache_encoded_rows or order_by or rows is not None:
+      if not workers and not isinstance(encoder, _OrjsonEncoder):
+        return self._Encode(encoder,
+                            self._ToJSonObj(columns_order, order_by, rows))
+      rows = self._PreparedData(order_by, rows)
+      return self._AssembleJSonTable(
+          encoder, columns_order,
+          [self._EncodeJSonRows(rows, encoder, columns_order, workers)])
+
+    fragments = self._CachedJSonRows(encoder, columns_order, workers)
+    if fragments is None:
+      data, num_rows = self.__snapshot[:2]
+      return self._EncodeJSonTable(encoder, columns_order,
+                                   rows=data[:num_rows], workers=workers)
+    return self._AssembleJSonTable(encoder, columns_order, fragments)
+
+  def _CachedJSonRows(self, encoder, columns_order, workers=None):
+    """Returns the cached encoded rows, after encoding the rows appended.
 
-    json_obj = {"cols": col_objs, "rows": row_objs}
-    if self.custom_properties:
-      json_obj["p"] = self.custom_properties
+    Args:
+      encoder: The JSON encoder to encode the rows appended with.
+      columns_order: The list of all column IDs in the order of the output.
+      workers: Optional. Passed as is to _EncodeJSonRows().
 
-    return json_obj
+    Returns:
+      The list of fragments of comma separated JSON row objects which, when
+      joined with commas, are all the rows of the current snapshot. None if
+      the cache holds more rows, filled by a reader of a newer snapshot.
+    """
+    key = tuple(columns_order)
+    data, num_rows = self.__snapshot[:2]
+    encoded_data, num_encoded, fragments = self.__encoded_rows.get(
+        key, (data, 0, []))
+    if encoded_data is not data:
+      # The cache was filled with the rows of another list, e.g. by a reader
+      # which took its snapshot before a LoadData(), so it starts over.
+      num_encoded, fragments = 0, []
+    if num_encoded > num_rows:
+      return None
+    if num_encoded < num_rows:
+      fragments = fragments + [self._EncodeJSonRows(
+          data[num_encoded:num_rows], encoder, columns_order, workers)]
+      # A reader whose snapshot was replaced meanwhile leaves the cache to
+      # the readers of the new one.
+      if self.__snapshot[0] is data:
+        self.__encoded_rows[key] = (data, num_rows, fragments)
+    return fragments
+
+  def _DeflatedJSonRows(self, columns_order, fragments):
+    """Returns the raw deflate segments of the given cached fragments.
+
+    Only the fragments appended since the last cached segment are compressed,
+    together and with the fragments before them as history. The first segment
+    is compressed without history, since the head before it differs between
+    responses. Fragments are cached as a segment once they add up to
+    _DEFLATE_MIN_SEGMENT bytes, so small appends do not add a flush each.
+
+    Args:
+      columns_order: The columns order the fragments were cached for.
+      fragments: The fragments returned by _CachedJSonRows(). All but the
+                 first are compressed with the comma joining them to the
+                 previous one.
 
-  def ToJSon(self, columns_order=None, order_by=()):
+    Returns:
+      A tuple of a list of tuples of uncompressed fragments (as UTF-8 bytes)
+      and their deflate segment, and the last _DEFLATE_WINDOW bytes of the
+      fragments, as history for the segment after them.
+    """
+    key = tuple(columns_order)
+    deflated_fragments, pieces, window = self.__deflated_rows.get(
+        key, ([], [], b""))
+    if len(deflated_fragments) > len(fragments) or [
+        1 for deflated, fragment in zip(deflated_fragments, fragments)
+        if deflated is not fragment]:
+      # The fragments were replaced since they were compressed.
+      deflated_fragments, pieces, window = [], [], b""
+    data = b"".join([self._EnsureBytes((i and "," or "") + fragments[i])
+                     for i in range(len(deflated_fragments), len(fragments))])
+    if not data:
+      return pieces, window
+    pieces = pieces + [(data, _DeflateSegment(data, window))]
+    window = (window + data)[-_DEFLATE_WINDOW:]
+    if len(data) >= _DEFLATE_MIN_SEGMENT:
+      self.__deflated_rows[key] = (list(fragments), pieces, window)
+    elif not deflated_fragments:
+      self.__deflated_rows.pop(key, None)
+    return pieces, window
+
+  def _EncodeJSonRows(self, rows, encoder, columns_order, workers=None):
+    """Returns the comma separated JSON objects of the given rows."""
+    parts = self._MapParts(workers, rows, "_EncodeJSonRows", encoder,
+                           columns_order)
+    if parts is not None:
+      return ",".join(parts)
+    if isinstance(encoder, _OrjsonEncoder) and len(rows) > _CHUNK_ROWS:
+      # A single value orjson cannot encode makes the whole object fall back
+      # to the json module, so the rows are encoded a chunk at a time.
+      return ",".join([self._EncodeJSonRows(rows[start:start + _CHUNK_ROWS],
+                                            encoder, columns_order)
+                       for start in range(0, len(rows), _CHUNK_ROWS)])
+    # The inner part of the encoded list is the comma separated rows.
+    return self._Encode(encoder, self._JSonRowObjs(rows, columns_order))[1:-1]
+
+  def _AssembleJSonTable(self, encoder, columns_order, fragments):
+    """Returns the JSON table of the given encoded rows, as _ToJSonObj()."""
+    head, tail = self._JSonTableEnds(encoder, columns_order)
+    return "".join([head, ",".join([fragment for fragment in fragments
+                                    if fragment]), tail])
+
+  def _JSonTableEnds(self, encoder, columns_order):
+    """Returns the JSON table before and after the encoded rows."""
+    tail = "]"
+    if self.custom_properties:
+      tail += ',"p":%s' % encoder.encode(
+          _JSonProperties(self.custom_properties))
+    return ('{"cols":%s,"rows":[' %
+            encoder.encode(self._JSonColumnObjs(columns_order)), tail + "}")
+
+  def ToJSon(self, columns_order=None, order_by=(), workers=None):
     """Returns a string that can be used in a JS DataTable constructor.
 
     This method writes a JSON string that can be passed directly into a Google
@@ -992,6 +3481,9 @@ class DataTable(object):
                      if you use it.
       order_by: Optional. Specifies the name of the column(s) to sort by.
                 Passed as is to _PreparedData().
+      workers: Optional. The number of processes, or a concurrent.futures
+               executor, to serialize large tables with in parallel. See
+               _MapParts().
 
     Returns:
       A JSon constructor string to generate a JS DataTable with the data
@@ -1007,13 +3499,38 @@ class DataTable(object):
       DataTableException: The data does not match the type.
     """
 
-    encoded_response_str = DataTableJSONEncoder().encode(self._ToJSonObj(columns_order, order_by))
+    encoded_response_str = self._EncodeJSonTable(
+        _json_encoder_class(), columns_order, order_by, workers=workers)
     if not isinstance(encoded_response_str, str):
-      return encoded_response_str.encode("utf-8")
-    return encoded_response_str
+      encoded_response_str = encoded_response_str.encode("utf-8")
+    return self._RecordOutput("json", encoded_response_str)
+
+  def ToJSonBytes(self, columns_order=None, order_by=()):
+    """Returns the JSON string of ToJSon() encoded in UTF-8.
+
+    The rows are encoded a chunk at a time straight into a single buffer, so
+    the whole table is never held as a string as well.
+
+    Args:
+      columns_order: Delegated to ToJSon.
+      order_by: Delegated to ToJSon.
+
+    Returns:
+      The bytes of the string returned by ToJSon(), encoded in UTF-8.
+
+    Raises:
+      DataTableException: The data does not match the type.
+    """
+    encoder = _json_encoder_class()
+    if columns_order is None:
+      columns_order = [col["id"] for col in self.__columns]
+    head, tail = self._JSonTableEnds(encoder, columns_order)
+    return self._RecordOutput("json", self._JoinBytes(self._IterJSonTable(
+        encoder, columns_order, order_by, None, head, tail)))
 
   def ToJSonResponse(self, columns_order=None, order_by=(), req_id=0,
-                     response_handler="google.visualization.Query.setResponse"):
+                     response_handler="google.visualization.Query.setResponse",
+                     since_version=None):
     """Writes a table as a JSON response that can be returned as-is to a client.
 
     This method writes a JSON response to return to a client in response to a
@@ -1027,6 +3544,11 @@ class DataTable(object):
       req_id: Optional. The response id, as retrieved by the request.
       response_handler: Optional. The response handler, as retrieved by the
           request.
+      since_version: Optional. A version token the client got in a previous
+          response. If given, the response carries the current "dataVersion"
+          and a "delta" flag. When the flag is true the table holds only the
+          rows appended since that version, otherwise (the token is unknown
+          or rows were changed in other ways since) it holds all the rows.
 
     Returns:
       A JSON response string to be received by JS the visualization Query
@@ -1041,16 +3563,151 @@ class DataTable(object):
           Visualization Gadgets or from JS code.
     """
 
-    response_obj = {
-        "version": "0.6",
-        "reqId": str(req_id),
-        "table": self._ToJSonObj(columns_order, order_by),
-        "status": "ok"
-    }
-    encoded_response_str = DataTableJSONEncoder().encode(response_obj)
+    encoder = _json_encoder_class()
+    rows, delta_str = self._DeltaRows(encoder, since_version)
+    # Equivalent to encoding {"version": "0.6", "reqId": str(req_id),
+    # "table": self._ToJSonObj(...), "status": "ok"}.
+    encoded_response_str = (
+        '{"version":"0.6","reqId":%s,"table":%s,"status":"ok"%s}' %
+        (encoder.encode(str(req_id)),
+         self._EncodeJSonTable(encoder, columns_order, order_by, rows),
+         delta_str))
     if not isinstance(encoded_response_str, str):
       encoded_response_str = encoded_response_str.encode("utf-8")
-    return "%s(%s);" % (response_handler, encoded_response_str)
+    return self._RecordOutput(
+        "json_response", "%s(%s);" % (response_handler, encoded_response_str))
+
+  def ToJSonResponseBytes(self, columns_order=None, order_by=(), req_id=0,
+                          response_handler=
+                          "google.visualization.Query.setResponse",
+                          since_version=None):
+    """Returns the response of ToJSonResponse() encoded in UTF-8.
+
+    The response handler call is written around the chunks of
+    IterJSonResponse() in a single buffer, rather than formatted around the
+    whole JSON string.
+
+    Args:
+      columns_order: Delegated to ToJSonResponse.
+      order_by: Delegated to ToJSonResponse.
+      req_id: Delegated to ToJSonResponse.
+      response_handler: Delegated to ToJSonResponse.
+      since_version: Delegated to ToJSonResponse.
+
+    Returns:
+      The bytes of the string returned by ToJSonResponse(), encoded in UTF-8.
+    """
+    return self._RecordOutput("json_response", self._JoinBytes(
+        self.IterJSonResponse(columns_order, order_by, req_id,
+                              response_handler, since_version)))
+
+  def _DeltaRows(self, encoder, since_version):
+    """Returns the rows of a response since a version, for ToJSonResponse().
+
+    Args:
+      encoder: The JSON encoder of the response.
+      since_version: The since_version passed to ToJSonResponse().
+
+    Returns:
+      A tuple of the rows to respond with (or None for all the rows) and the
+      JSON members of the response describing the delta.
+    """
+    if since_version is None:
+      return None, ""
+    snapshot = self.__snapshot
+    first_row = self._RowsAtVersion(since_version, snapshot)
+    delta_str = ',"dataVersion":%s,"delta":%s' % (
+        encoder.encode("%s.%d" % (self.__version_epoch, snapshot[2])),
+        "false" if first_row is None else "true")
+    return snapshot[0][first_row or 0:snapshot[1]], delta_str
+
+  def IterJSonResponse(self, columns_order=None, order_by=(), req_id=0,
+                       response_handler=
+                       "google.visualization.Query.setResponse",
+                       since_version=None, compress=None):
+    """Returns an iterator over the JSON response of ToJSonResponse().
+
+    Every chunk of rows holds up to _CHUNK_ROWS rows, so the whole response
+    is never held in memory at once. If the table caches its encoded rows and
+    no order is requested, the cached rows are sent instead, and their gzip
+    and deflate compression is cached as well.
+
+    Args:
+      columns_order: Delegated to ToJSonResponse.
+      order_by: Delegated to ToJSonResponse.
+      req_id: Delegated to ToJSonResponse.
+      response_handler: Delegated to ToJSonResponse.
+      since_version: Delegated to ToJSonResponse.
+      compress: Optional. The content coding to compress the response with:
+                "gzip" or "deflate", or "br" or "zstd" if brotli or
+                zstandard are installed.
+
+    Returns:
+      An iterator over strings which, when concatenated, are the response
+      returned by ToJSonResponse(), or over the bytes of its compression.
+
+    Raises:
+      DataTableException: The compression is not available.
+    """
+    encoder = _json_encoder_class()
+    rows, delta_str = self._DeltaRows(encoder, since_version)
+    if columns_order is None:
+      columns_order = [col["id"] for col in self.__columns]
+    head, tail = self._JSonTableEnds(encoder, columns_order)
+    head = self._EnsureStr('%s({"version":"0.6","reqId":%s,"table":%s' % (
+        response_handler, encoder.encode(str(req_id)), head))
+    tail = self._EnsureStr('%s,"status":"ok"%s});' % (tail, delta_str))
+    return self._IterJSonTable(encoder, columns_order, order_by, rows, head,
+                               tail, compress)
+
+  def _IterJSonTable(self, encoder, columns_order, order_by, rows, head, tail,
+                     compress=None):
+    """Returns an iterator over a JSON table between the given head and tail.
+
+    Args:
+      encoder: The JSON encoder to encode the rows with.
+      columns_order: The list of all column IDs in the order of the output.
+      order_by: Passed as is to _PreparedData().
+      rows: The rows of the table, or None for all of its rows.
+      head: The string before the encoded rows.
+      tail: The string after the encoded rows.
+      compress: Optional. As in IterJSonResponse().
+
+    Returns:
+      An iterator over the head, the chunks of encoded rows and the tail, as
+      strings, or over the bytes of their compression.
+    """
+    fragments = None
+    if self.__cache_encoded_rows and not order_by and rows is None:
+      fragments = self._CachedJSonRows(encoder, columns_order)
+    if fragments is None:
+      chunks = self._IterJSonRows(encoder, columns_order, order_by, rows,
+                                  head, tail)
+    elif compress in ("gzip", "deflate"):
+      head = self._EnsureBytes(head)
+      tail = self._EnsureBytes(tail)
+      pieces, window = self._DeflatedJSonRows(columns_order, fragments)
+      # The window holds all of the fragments if they are shorter than it.
+      return _DeflateStream(compress, [(head, _DeflateSegment(head))] +
+                            pieces +
+                            [(tail, _DeflateSegment(tail, head + window,
+                                                    final=True))])
+    else:
+      chunks = iter([head] + [self._EnsureStr((i and "," or "") + fragment)
+                              for i, fragment in enumerate(fragments)] +
+                    [tail])
+    if compress:
+      return _CompressChunks(chunks, compress)
+    return chunks
+
+  def _IterJSonRows(self, encoder, columns_order, order_by, rows, head, tail):
+    """Yields the head, the prepared rows in chunks, and the tail."""
+    yield head
+    data = self._PreparedData(order_by, rows)
+    for start in range(0, len(data), _CHUNK_ROWS):
+      yield self._EnsureStr((start and "," or "") + self._EncodeJSonRows(
+          data[start:start + _CHUNK_ROWS], encoder, columns_order))
+    yield tail
 
   def ToResponse(self, columns_order=None, order_by=(), tqx=""):
     """Writes the right response according to the request string passed in tqx.
@@ -1060,8 +3717,8 @@ class DataTable(object):
     and returns the right response according to the request.
     It parses out the "out" parameter of tqx, calls the relevant response
     (ToJSonResponse() for "json", ToCsv() for "csv", ToHtml() for "html",
-    ToTsvExcel() for "tsv-excel") and passes the response function the rest of
-    the relevant request keys.
+    ToTsvExcel() for "tsv-excel", ToBinary() for "binary") and passes the
+    response function the rest of the relevant request keys.
 
     Args:
       columns_order: Optional. Passed as is to the relevant response function.
@@ -1077,6 +3734,33 @@ class DataTable(object):
     Raises:
       DataTableException: One of the parameters passed in tqx is not supported.
     """
+    tqx_dict = self._ParseTqx(tqx)
+    if tqx_dict.get("out", "json") == "json":
+      response_handler = tqx_dict.get("responseHandler",
+                                      "google.visualization.Query.setResponse")
+      return self.ToJSonResponse(columns_order, order_by,
+                                 req_id=tqx_dict.get("reqId", 0),
+                                 since_version=tqx_dict.get("sinceVersion"),
+                                 response_handler=response_handler)
+    elif tqx_dict["out"] == "html":
+      return self.ToHtml(columns_order, order_by)
+    elif tqx_dict["out"] == "csv":
+      return self.ToCsv(columns_order, order_by)
+    elif tqx_dict["out"] == "tsv-excel":
+      return self.ToTsvExcel(columns_order, order_by)
+    elif tqx_dict["out"] == "binary":
+      return self.ToBinary(columns_order, order_by)
+    else:
+      raise DataTableException(
+          "'out' parameter: '%s' is not supported" % tqx_dict["out"])
+
+  @staticmethod
+  def _ParseTqx(tqx):
+    """Returns the dictionary of the options of a tqx request string.
+
+    Raises:
+      DataTableException: The version requested is not supported.
+    """
     tqx_dict = {}
     if tqx:
       tqx_dict = dict(opt.split(":") for opt in tqx.split(";"))
@@ -1084,19 +3768,115 @@ class DataTable(object):
       raise DataTableException(
           "Version (%s) passed by request is not supported."
           % tqx_dict["version"])
+    return tqx_dict
 
-    if tqx_dict.get("out", "json") == "json":
+  def IterResponse(self, columns_order=None, order_by=(), tqx="",
+                   compress=None):
+    """Returns an iterator over the chunks of the response of ToResponse().
+
+    The streaming variant of each response function is used (e.g.
+    IterJSonResponse() for "json" and IterCsv() for "csv"), so large tables
+    can be sent as the rows are serialized. The chunks are strings, except
+    for "tsv-excel" and "binary" whose chunks are bytes.
+
+    Args:
+      columns_order: Delegated to ToResponse.
+      order_by: Delegated to ToResponse.
+      tqx: Delegated to ToResponse.
+      compress: Optional. The content coding to compress the response with,
+                as in IterJSonResponse(). The chunks are then bytes.
+
+    Returns:
+      An iterator over the chunks which, when concatenated, are the response
+      returned by ToResponse(), or its compression.
+
+    Raises:
+      DataTableException: One of the parameters passed in tqx is not
+                          supported, or the compression is not available.
+    """
+    tqx_dict = self._ParseTqx(tqx)
+    out = tqx_dict.get("out", "json")
+    if out == "json":
       response_handler = tqx_dict.get("responseHandler",
                                       "google.visualization.Query.setResponse")
-      return self.ToJSonResponse(columns_order, order_by,
-                                 req_id=tqx_dict.get("reqId", 0),
-                                 response_handler=response_handler)
+      chunks = self.IterJSonResponse(columns_order, order_by,
+                                     req_id=tqx_dict.get("reqId", 0),
+                                     since_version=tqx_dict.get("sinceVersion"),
+                                     response_handler=response_handler,
+                                     compress=compress)
+      compress = None
     elif tqx_dict["out"] == "html":
-      return self.ToHtml(columns_order, order_by)
+      chunks = self.IterHtml(columns_order, order_by)
     elif tqx_dict["out"] == "csv":
-      return self.ToCsv(columns_order, order_by)
+      chunks = self.IterCsv(columns_order, order_by)
     elif tqx_dict["out"] == "tsv-excel":
-      return self.ToTsvExcel(columns_order, order_by)
+      chunks = self.IterTsvExcel(columns_order, order_by)
+    elif tqx_dict["out"] == "binary":
+      chunks = iter([self.ToBinary(columns_order, order_by)])
     else:
       raise DataTableException(
           "'out' parameter: '%s' is not supported" % tqx_dict["out"])
+    if compress:
+      chunks = _CompressChunks(chunks, compress)
+    if self.stats is not None:
+      chunks = self._CountedChunks("response:" + out, chunks)
+    return chunks
+
+  def _CountedChunks(self, output_format, chunks):
+    """Yields the chunks, recording their total size as an output."""
+    size = chars = 0
+    for chunk in chunks:
+      if isinstance(chunk, six.binary_type):
+        size += len(chunk)
+      else:
+        chars += len(chunk)
+      yield chunk
+    self.stats.RecordOutput(output_format, size, chars)
+
+  def ToResponseAsync(self, columns_order=None, order_by=(), tqx="",
+                      executor=None):
+    """Returns an asyncio future of the response of ToResponse().
+
+    The response is serialized in an executor, so the event loop keeps
+    running meanwhile. Usage (within a coroutine):
+      response = await data_table.ToResponseAsync(tqx=tqx)
+
+    Args:
+      columns_order: Delegated to ToResponse.
+      order_by: Delegated to ToResponse.
+      tqx: Delegated to ToResponse.
+      executor: Optional. The concurrent.futures executor to serialize in. By
+                default, the default executor of the event loop is used.
+
+    Returns:
+      An asyncio future of the string returned by ToResponse().
+    """
+    return asyncio.get_event_loop().run_in_executor(
+        executor, functools.partial(self.ToResponse, columns_order, order_by,
+                                    tqx))
+
+  def IterResponseAsync(self, columns_order=None, order_by=(), tqx="",
+                        compress=None):
+    """Returns an async iterator over the chunks of the response.
+
+    The chunks are those of IterResponse(). Control returns to the event loop
+    after every chunk, so other tasks run between the batches of rows.
+    Usage (within a coroutine):
+      async for chunk in data_table.IterResponseAsync(tqx=tqx):
+        await response.write(chunk)
+
+    Args:
+      columns_order: Delegated to IterResponse.
+      order_by: Delegated to IterResponse.
+      tqx: Delegated to IterResponse.
+      compress: Delegated to IterResponse.
+
+    Returns:
+      An asynchronous iterator over the chunks of the response.
+
+    Raises:
+      DataTableException: One of the parameters passed in tqx is not
+                          supported, or the compression is not available.
+    """
+    return _AsyncChunks(self.IterResponse(columns_order, order_by, tqx,
+                                          compress))
@@ -0,0 +1,245 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2009 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Serves Google Visualization data sources over WSGI and ASGI.
+
+The applications of this module parse the tq and tqx parameters of a data
+source request, get a DataTable from a callable given by the user, and stream
+back the response of DataTable.IterResponse() with the content type of the
+requested output format. For example, with the wsgiref reference server:
+
+  def MakeTable(params):
+    return gviz_api.DataTable(description, LoadRows())
+
+  app = gviz_api_server.WSGIDataSource(MakeTable)
+  wsgiref.simple_server.make_server("", 8080, app).serve_forever()
+
+This module requires Python 3.5 or higher.
+"""
+
+__author__ = "Amit Weinstein, Misha Seltzer, Jacob Baskin"
+
+import asyncio
+import http.client
+import json
+import re
+import urllib.parse
+
+import gviz_api
+
+
+# The content type of each output format of DataTable.ToResponse().
+_CONTENT_TYPES = {"json": "text/javascript; charset=utf-8",
+                  "html": "text/html; charset=utf-8",
+                  "csv": "text/csv; charset=utf-8",
+                  "tsv-excel": "application/vnd.ms-excel; charset=UTF-16LE",
+                  "binary": "application/octet-stream"}
+
+# The output formats which are downloaded as files, named by the outFileName
+# option of tqx.
+_ATTACHMENT_OUTPUTS = ("csv", "tsv-excel")
+_DEFAULT_FILE_NAME = "data.csv"
+
+# The characters of a file name which are not token characters of RFC 7230,
+# dropped from the filename parameter of Content-Disposition.
+_NON_TOKEN_CHARS = re.compile(r"[^A-Za-z0-9!#$&+.^_`|~-]")
+
+_DEFAULT_RESPONSE_HANDLER = "google.visualization.Query.setResponse"
+
+
+def _ParseQuery(query_string):
+  """Returns the dictionary of the parameters of a query string."""
+  return dict(urllib.parse.parse_qsl(query_string, keep_blank_values=True))
+
+
+def _TqxOptions(tqx):
+  """Returns the well formed options of a tqx string.
+
+  DataTable.IterResponse() validates the tqx string; this parsing also
+  serves the invalid ones in error responses.
+  """
+  options = {}
+  for opt in tqx.split(";"):
+    key, sep, value = opt.partition(":")
+    if sep:
+      options[key] = value
+  return options
+
+
+def _ContentDisposition(file_name):
+  """Returns the Content-Disposition header of a download of the given name.
+
+  The name comes from the request, so only its token characters are kept in
+  the filename parameter, which then cannot split the header. A name with
+  other printable characters is also given in full in a percent encoded
+  RFC 5987 filename* parameter. Control characters are dropped.
+  """
+  printable = "".join(c for c in file_name if c.isprintable())
+  token = _NON_TOKEN_CHARS.sub("", printable) or _DEFAULT_FILE_NAME
+  header = 'attachment; filename="%s"' % token
+  if printable and printable != token:
+    header += "; filename*=UTF-8''%s" % urllib.parse.quote(printable, safe="")
+  return header
+
+
+def _Bytes(chunks):
+  """Yields the given chunks, with strings encoded in UTF-8."""
+  for chunk in chunks:
+    if isinstance(chunk, str):
+      chunk = chunk.encode("utf-8")
+    if chunk:
+      yield chunk
+
+
+class DataSource(object):
+  """Base class of the data source applications.
+
+  Subclasses adapt the response built by _Response() to a server interface.
+  """
+
+  def __init__(self, table_factory, columns_order=None, order_by=(),
+               compress=True):
+    """Initializes the application.
+
+    Args:
+      table_factory: A callable returning the DataTable to respond with. It
+                     is called for every request with the dictionary of the
+                     query parameters of the request (which include "tq" and
+                     "tqx" if the client sent them).
+      columns_order: Optional. Passed as is to DataTable.IterResponse().
+      order_by: Optional. Passed as is to DataTable.IterResponse().
+      compress: Optional. If True (the default), responses are compressed
+                with gzip for clients accepting it.
+    """
+    self.table_factory = table_factory
+    self.columns_order = columns_order
+    self.order_by = order_by
+    self.compress = compress
+
+  def _Response(self, method, query_string, accept_encoding=""):
+    """Returns the response to a request.
+
+    Args:
+      method: The HTTP method of the request.
+      query_string: The query string of the request URL.
+      accept_encoding: Optional. The Accept-Encoding header of the request.
+
+    Returns:
+      A tuple of the HTTP status code, the list of (name, value) header
+      tuples and an iterator over the byte string chunks of the body.
+    """
+    if method not in ("GET", "HEAD"):
+      return (405, [("Allow", "GET, HEAD"),
+                    ("Content-Type", "text/plain; charset=utf-8")],
+              iter([b"Method not allowed\n"]))
+
+    params = _ParseQuery(query_string)
+    tqx = params.get("tqx", "")
+    compress = None
+    if self.compress and "gzip" in accept_encoding.lower():
+      compress = "gzip"
+    table = self.table_factory(params)
+    try:
+      chunks = table.IterResponse(self.columns_order, self.order_by, tqx,
+                                  compress)
+    except (gviz_api.DataTableException, ValueError) as e:
+      return self._ErrorResponse(tqx, str(e))
+    tqx_dict = _TqxOptions(tqx)
+
+    out = tqx_dict.get("out", "json")
+    headers = [("Content-Type", _CONTENT_TYPES[out])]
+    if out in _ATTACHMENT_OUTPUTS:
+      headers.append(("Content-Disposition", _ContentDisposition(
+          tqx_dict.get("outFileName", _DEFAULT_FILE_NAME))))
+    chunks = _Bytes(chunks)
+    if self.compress:
+      headers.append(("Vary", "Accept-Encoding"))
+    if compress:
+      headers.append(("Content-Encoding", compress))
+    if method == "HEAD":
+      chunks = iter([])
+    return 200, headers, chunks
+
+  def _ErrorResponse(self, tqx, message):
+    """Returns the response to an invalid request, as _Response()."""
+    tqx_dict = _TqxOptions(tqx)
+    response = {"version": "0.6",
+                "reqId": tqx_dict.get("reqId", "0"),
+                "status": "error",
+                "errors": [{"reason": "invalid_request", "message": message}]}
+    body = "%s(%s);" % (
+        tqx_dict.get("responseHandler", _DEFAULT_RESPONSE_HANDLER),
+        json.dumps(response, separators=(",", ":")))
+    return (400, [("Content-Type", _CONTENT_TYPES["json"])],
+            iter([body.encode("utf-8")]))
+
+
+class WSGIDataSource(DataSource):
+  """WSGI application serving a DataTable as a data source.
+
+  The body is streamed, a chunk of rows at a time.
+  """
+
+  def __call__(self, environ, start_response):
+    status, headers, chunks = self._Response(
+        environ.get("REQUEST_METHOD", "GET"),
+        environ.get("QUERY_STRING", ""),
+        environ.get("HTTP_ACCEPT_ENCODING", ""))
+    start_response("%d %s" % (status, http.client.responses[status]), headers)
+    return chunks
+
+
+class ASGIDataSource(DataSource):
+  """ASGI application serving a DataTable as a data source.
+
+  The table factory and the serialization of every chunk of rows run in the
+  default executor of the event loop, so the loop keeps serving other
+  requests meanwhile.
+  """
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] == "lifespan":
+      while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+          await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+          await send({"type": "lifespan.shutdown.complete"})
+          return
+    if scope["type"] != "http":
+      raise ValueError("Unsupported ASGI scope type: %s" % scope["type"])
+
+    accept_encoding = ""
+    for name, value in scope.get("headers", ()):
+      if name.lower() == b"accept-encoding":
+        accept_encoding = value.decode("latin-1")
+    loop = asyncio.get_event_loop()
+    status, headers, chunks = await loop.run_in_executor(
+        None, self._Response, scope.get("method", "GET"),
+        scope.get("query_string", b"").decode("latin-1"), accept_encoding)
+    await send({"type": "http.response.start",
+                "status": status,
+                "headers": [(name.lower().encode("latin-1"),
+                             value.encode("latin-1"))
+                            for name, value in headers]})
+    while True:
+      chunk = await loop.run_in_executor(None, next, chunks, None)
+      if chunk is None:
+        break
+      await send({"type": "http.response.body", "body": chunk,
+                  "more_body": True})
+    await send({"type": "http.response.body", "body": b"",
+                "more_body": False})
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2009 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the gviz_api_server module."""
+
+__author__ = "Amit Weinstein"
+
+import asyncio
+import gzip
+import json
+import unittest
+from wsgiref import util
+from wsgiref import validate
+
+from gviz_api import DataTable
+from gviz_api_server import ASGIDataSource
+from gviz_api_server import WSGIDataSource
+
+
+class DataSourceTest(unittest.TestCase):
+
+  def setUp(self):
+    self.params = []
+    self.table = DataTable([("a", "number", "A"), ("b", "string")],
+                           [[i, "s\u05d0%d" % i] for i in range(2500)])
+
+  def MakeTable(self, params):
+    self.params.append(params)
+    return self.table
+
+  def Get(self, app, query_string="", method="GET", accept_encoding=None):
+    environ = {"QUERY_STRING": query_string, "REQUEST_METHOD": method}
+    if accept_encoding is not None:
+      environ["HTTP_ACCEPT_ENCODING"] = accept_encoding
+    util.setup_testing_defaults(environ)
+    response = {}
+
+    def StartResponse(status, headers, exc_info=None):
+      response["status"] = status
+      response["headers"] = dict(headers)
+
+    chunks = validate.validator(app)(environ, StartResponse)
+    try:
+      response["chunks"] = list(chunks)
+    finally:
+      chunks.close()
+    response["body"] = b"".join(response["chunks"])
+    return response
+
+  def testWSGIResponses(self):
+    app = WSGIDataSource(self.MakeTable, order_by=("a", "desc"))
+    response = self.Get(app, "tq=select%20*&tqx=reqId:3")
+    self.assertEqual("200 OK", response["status"])
+    self.assertEqual("text/javascript; charset=utf-8",
+                     response["headers"]["Content-Type"])
+    self.assertEqual(
+        self.table.ToResponse(order_by=("a", "desc"), tqx="reqId:3"),
+        response["body"].decode("utf-8"))
+    self.assertTrue(len(response["chunks"]) > 2)
+    self.assertEqual([{"tq": "select *", "tqx": "reqId:3"}], self.params)
+
+    response = self.Get(app, "tqx=out:csv")
+    self.assertEqual("text/csv; charset=utf-8",
+                     response["headers"]["Content-Type"])
+    self.assertEqual('attachment; filename="data.csv"',
+                     response["headers"]["Content-Disposition"])
+    self.assertEqual(self.table.ToCsv(order_by=("a", "desc")),
+                     response["body"].decode("utf-8"))
+
+    response = self.Get(app, "tqx=out:tsv-excel;outFileName:a.tsv")
+    self.assertEqual("application/vnd.ms-excel; charset=UTF-16LE",
+                     response["headers"]["Content-Type"])
+    self.assertEqual('attachment; filename="a.tsv"',
+                     response["headers"]["Content-Disposition"])
+    self.assertEqual(self.table.ToTsvExcel(order_by=("a", "desc")),
+                     response["body"])
+
+    # File names cannot inject headers, and other characters are encoded.
+    response = self.Get(
+        app, "tqx=out:csv;outFileName:x%0d%0a%0d%0a<script>%22.csv")
+    self.assertEqual("attachment; filename=\"xscript.csv\"; "
+                     "filename*=UTF-8''x%3Cscript%3E%22.csv",
+                     response["headers"]["Content-Disposition"])
+    response = self.Get(app, "tqx=out:csv;outFileName:%D7%A9 %0a.csv")
+    self.assertEqual("attachment; filename=\".csv\"; "
+                     "filename*=UTF-8''%D7%A9%20.csv",
+                     response["headers"]["Content-Disposition"])
+    response = self.Get(app, "tqx=out:csv;outFileName:%0d%0a")
+    self.assertEqual('attachment; filename="data.csv"',
+                     response["headers"]["Content-Disposition"])
+
+    response = self.Get(app, "tqx=out:html")
+    self.assertEqual("text/html; charset=utf-8",
+                     response["headers"]["Content-Type"])
+    self.assertNotIn("Content-Disposition", response["headers"])
+
+    response = self.Get(app, "tqx=out:binary", method="HEAD")
+    self.assertEqual("application/octet-stream",
+                     response["headers"]["Content-Type"])
+    self.assertEqual(b"", response["body"])
+
+  def testWSGICompression(self):
+    app = WSGIDataSource(self.MakeTable)
+    response = self.Get(app, accept_encoding="deflate, gzip")
+    self.assertEqual("gzip", response["headers"]["Content-Encoding"])
+    self.assertEqual("Accept-Encoding", response["headers"]["Vary"])
+    self.assertEqual(self.table.ToResponse(),
+                     gzip.decompress(response["body"]).decode("utf-8"))
+
+    response = self.Get(WSGIDataSource(self.MakeTable, compress=False),
+                        accept_encoding="gzip")
+    self.assertNotIn("Content-Encoding", response["headers"])
+    self.assertEqual(self.table.ToResponse(), response["body"].decode("utf-8"))
+
+  def testWSGIErrors(self):
+    app = WSGIDataSource(self.MakeTable)
+    response = self.Get(app, "tqx=reqId:5;out:bad;responseHandler:handle")
+    self.assertEqual("400 Bad Request", response["status"])
+    body = response["body"].decode("utf-8")
+    self.assertTrue(body.startswith("handle(") and body.endswith(");"))
+    error = json.loads(body[len("handle("):-2])
+    self.assertEqual("error", error["status"])
+    self.assertEqual("5", error["reqId"])
+    self.assertEqual("invalid_request", error["errors"][0]["reason"])
+
+    response = self.Get(app, "tqx=version")
+    self.assertEqual("400 Bad Request", response["status"])
+
+    response = self.Get(app, method="POST")
+    self.assertEqual("405 Method Not Allowed", response["status"])
+    self.assertEqual("GET, HEAD", response["headers"]["Allow"])
+
+  def testASGIResponses(self):
+    app = ASGIDataSource(self.MakeTable)
+    loop = asyncio.new_event_loop()
+    try:
+      def Request(scope):
+        messages = []
+        received = [{"type": "lifespan.startup"},
+                    {"type": "lifespan.shutdown"}]
+
+        async def Receive():
+          return received.pop(0)
+
+        async def Send(message):
+          messages.append(message)
+
+        loop.run_until_complete(app(scope, Receive, Send))
+        return messages
+
+      self.assertEqual([{"type": "lifespan.startup.complete"},
+                        {"type": "lifespan.shutdown.complete"}],
+                       Request({"type": "lifespan"}))
+
+      messages = Request({"type": "http", "method": "GET",
+                          "query_string": b"tqx=out:csv",
+                          "headers": [(b"accept-encoding", b"gzip")]})
+      self.assertEqual("http.response.start", messages[0]["type"])
+      self.assertEqual(200, messages[0]["status"])
+      headers = dict(messages[0]["headers"])
+      self.assertEqual(b"text/csv; charset=utf-8", headers[b"content-type"])
+      self.assertEqual(b"gzip", headers[b"content-encoding"])
+      self.assertFalse(messages[-1]["more_body"])
+      self.assertTrue(all(message["more_body"] for message in messages[1:-1]))
+      body = b"".join(message["body"] for message in messages[1:])
+      self.assertEqual(self.table.ToCsv(),
+                       gzip.decompress(body).decode("utf-8"))
+
+      messages = Request({"type": "http", "method": "GET",
+                          "query_string": b"tqx=out:bad"})
+      self.assertEqual(400, messages[0]["status"])
+    finally:
+      loop.close()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -21,20 +21,42 @@ __author__ = "Amit Weinstein"
 from datetime import date
 from datetime import datetime
 from datetime import time
+from datetime import timedelta
+from datetime import tzinfo
 import decimal
 import fractions
+import os
+import pickle
+import shutil
+import tempfile
 try:
   import json
 except ImportError:
   import simplejson as json
+import threading
 import unittest
+import zlib
 
 import six
 
+import gviz_api
 from gviz_api import DataTable
 from gviz_api import DataTableException
 
 
+class FixedOffset(tzinfo):
+  """A timezone with a fixed offset from UTC, in hours."""
+
+  def __init__(self, hours):
+    self.offset = timedelta(hours=hours)
+
+  def utcoffset(self, unused_dt):
+    return self.offset
+
+  def dst(self, unused_dt):
+    return timedelta(0)
+
+
 class DataTableTest(unittest.TestCase):
 
   def testCoerceValue(self):
@@ -390,6 +412,509 @@ class DataTableTest(unittest.TestCase):
     self.assertEqual(json.dumps(json_obj, separators=(",", ":")),
                      table.ToJSon())
 
+  def testTemporalLiterals(self):
+    # Equal timezone aware values with different fields are not confused.
+    table = DataTable([("d", "date"), ("dt", "datetime"), ("t", "timeofday")],
+                      [[date(2001, 2, 3), datetime(2001, 2, 3, 4, 5, 6, 7999),
+                        time(1, 2, 3)],
+                       [datetime(2001, 2, 3, 9), datetime(2001, 2, 3, 4, 5, 6),
+                        time(1, 2, 3)],
+                       [date(2001, 2, 3),
+                        datetime(2001, 2, 3, 12, tzinfo=FixedOffset(0))],
+                       [date(2001, 2, 4),
+                        datetime(2001, 2, 3, 13, tzinfo=FixedOffset(1))]])
+    json_obj = json.loads(table.ToJSon())
+    self.assertEqual(
+        [["Date(2001,1,3)", "Date(2001,1,3,4,5,6,7)", [1, 2, 3]],
+         ["Date(2001,1,3)", "Date(2001,1,3,4,5,6)", [1, 2, 3]],
+         ["Date(2001,1,3)", "Date(2001,1,3,12,0,0)", None],
+         ["Date(2001,1,4)", "Date(2001,1,3,13,0,0)", None]],
+        [[cell and cell["v"] for cell in row["c"]]
+         for row in json_obj["rows"]])
+    jscode = table.ToJSCode("t")
+    self.assertTrue("t.setCell(2, 1, new Date(2001,1,3,12,0,0));\n" in jscode)
+    self.assertTrue("t.setCell(3, 1, new Date(2001,1,3,13,0,0));\n" in jscode)
+    self.assertTrue("t.setCell(0, 1, new Date(2001,1,3,4,5,6,7));\n" in jscode)
+    self.assertEqual(["2001-02-03 12:00:00+00:00", "2001-02-03 13:00:00+01:00"],
+                     [line.split(",")[1]
+                      for line in table.ToCsv().splitlines()[3:]])
+
+    # Values are coerced once as they are added.
+    rows = table._Rows()
+    self.assertEqual(date, type(rows[1][0]["d"]))
+    self.assertEqual(date(2001, 2, 3), rows[1][0]["d"])
+    table = DataTable([("t", "timeofday")],
+                      [[datetime(2001, 2, 3, 4, 5, 6, 7000)], [(None, "n")]])
+    self.assertEqual(time(4, 5, 6), table._Rows()[0][0]["t"])
+    table = DataTable([("d", "date")], [["2001-02-03"]])
+    self.assertRaises(DataTableException, table.ToJSon)
+
+    # Subclasses of date, which have no tzinfo, are formatted as dates.
+    class DateSubclass(date):
+      pass
+    table = DataTable([("d", "date")], [[DateSubclass(2020, 1, 2)]])
+    self.assertEqual("Date(2020,0,2)",
+                     json.loads(table.ToJSon())["rows"][0]["c"][0]["v"])
+    self.assertEqual("Date(2020,0,2)", json.loads(
+        table.ToJSonResponse()[39:-2])["table"]["rows"][0]["c"][0]["v"])
+    self.assertTrue("t.setCell(0, 0, new Date(2020,0,2));\n" in
+                    table.ToJSCode("t"))
+
+  def testStats(self):
+    stats = gviz_api.DataTableStats()
+    table = DataTable([("a", "number"), ("b", "string")],
+                      [[3, "x"], [1, "y"]], stats=stats)
+    table.AppendData([[2, "z"]])
+    self.assertEqual(3, stats.counts["append"])
+    json_output = table.ToJSon(order_by="a")
+    self.assertEqual(3, stats.counts["sort"])
+    self.assertEqual(3, stats.counts["build"])
+    self.assertEqual(6, stats.counts["convert"])
+    self.assertEqual(1, stats.counts["encode"])
+    self.assertEqual({"json": len(json_output)}, stats.output_chars)
+    csv_output = table.ToCsv()
+    self.assertEqual(12, stats.counts["convert"])
+    self.assertEqual(len(csv_output), stats.output_chars["csv"])
+    chunks = list(table.IterResponse(tqx="out:html"))
+    self.assertEqual(sum(len(chunk) for chunk in chunks),
+                     stats.output_chars["response:html"])
+    self.assertEqual(1, stats.outputs["response:html"])
+    self.assertTrue(all(seconds >= 0 for seconds in stats.seconds.values()))
+    self.assertEqual(set(stats.seconds), set(stats.counts))
+    self.assertEqual(stats.output_chars, stats.AsDict()["output_chars"])
+    self.assertEqual({}, stats.output_bytes)
+
+    # Text outputs are counted in characters, and bytes outputs in bytes.
+    stats.Reset()
+    table.AppendData([[4, u"\u05e9"]])
+    json_output = table.ToJSon()
+    json_bytes = table.ToJSonBytes()
+    self.assertEqual(len(json_output) + 1, len(json_bytes))
+    self.assertEqual(len(json_output), stats.output_chars["json"])
+    self.assertEqual(len(json_bytes), stats.output_bytes["json"])
+    self.assertEqual(2, stats.outputs["json"])
+    self.assertEqual(len(table.ToTsvExcel()), stats.output_bytes["tsv-excel"])
+    chunks = list(table.IterResponse(tqx="out:html", compress="gzip"))
+    self.assertEqual(sum(len(chunk) for chunk in chunks),
+                     stats.output_bytes["response:html"])
+    self.assertNotIn("response:html", stats.output_chars)
+    self.assertEqual(stats.output_bytes, stats.AsDict()["output_bytes"])
+
+    stats.Reset()
+    self.assertEqual({}, stats.AsDict()["counts"])
+    table.stats = None
+    table.ToJSon(order_by="a")
+    table.ToResponse(tqx="out:csv")
+    self.assertEqual({"seconds": {}, "counts": {}, "output_bytes": {},
+                      "output_chars": {}, "outputs": {}}, stats.AsDict())
+
+  def testColumnFormatter(self):
+    description = [("a", "number"), ("b", "string"), ("c", "date")]
+    cp = {"cell_cp": "v"}
+    formatted = DataTable(description, [
+        [(1000, "$1,000.00"), ("x", "X"), (date(2001, 2, 3), "03/02/2001")],
+        [(2.5, "$2.50"), ("y", "own"), None],
+        [(3, "three"), ("z", "Z", cp), (date(2001, 2, 4), "04/02/2001", cp)]])
+    table = DataTable(description, [
+        [1000, "x", date(2001, 2, 3)],
+        [2.5, ("y", "own"), None],
+        [(3, "three"), ("z", None, cp), (date(2001, 2, 4), None, cp)]],
+                      cache_encoded_rows=True, dictionary_columns=["b"])
+    # Cached outputs are dropped by SetColumnFormatter().
+    table.ToJSon()
+    table.ToHtml()
+    table.SetColumnFormatter("a", "${:,.2f}")
+    table.SetColumnFormatter("b", six.text_type.upper)
+    table.SetColumnFormatter("c", "%d/%m/%Y")
+    self.assertEqual(formatted.ToJSon(), table.ToJSon())
+    self.assertEqual(formatted.ToJSCode("t"), table.ToJSCode("t"))
+    self.assertEqual(formatted.ToHtml(), table.ToHtml())
+    self.assertEqual(formatted.ToCsv(), table.ToCsv())
+    self.assertEqual(formatted.ToJSon(),
+                     pickle.loads(pickle.dumps(table)).ToJSon())
+
+    table.SetColumnFormatter("a", None)
+    self.assertEqual({"v": 1000}, json.loads(table.ToJSon())["rows"][0]["c"][0])
+    table.SetColumnFormatter("a", lambda value: value)
+    self.assertRaises(DataTableException, table.ToJSon)
+    self.assertRaises(DataTableException, table.SetColumnFormatter, "d", "{}")
+    self.assertRaises(DataTableException, table.SetColumnFormatter, "a", 5)
+
+  def testColumnPrecision(self):
+    description = [("a", "number"), ("b", "number")]
+    data = [[0.1 + 0.2, 1 / 3.0], [(2 / 3.0, None, {"cell_cp": "v"}), 7],
+            [decimal.Decimal("1.005"), (1e-7, "tiny")], [None, True]]
+    table = DataTable(description, data, cache_encoded_rows=True)
+    rounded = DataTable(description, [
+        [0.3, 1 / 3.0], [(0.67, None, {"cell_cp": "v"}), 7],
+        [1.0, (1e-7, "tiny")], [None, True]])
+    table.ToJSon()
+    table.SetColumnPrecision("a", 2)
+    self.assertEqual(rounded.ToJSon(), table.ToJSon())
+    self.assertEqual(rounded.ToJSCode("t"), table.ToJSCode("t"))
+    self.assertEqual(rounded.ToHtml(), table.ToHtml())
+    self.assertEqual(rounded.ToCsv(), table.ToCsv())
+    self.assertEqual(DataTable(description, data).ToBinary(),
+                     table.ToBinary())
+
+    # Formatted values are computed from rounded values.
+    table.SetColumnPrecision("b", -1)
+    table.SetColumnFormatter("b", "{:g}")
+    self.assertEqual([{"v": 0.0, "f": "0"}, {"v": 7, "f": "7"},
+                      {"v": 0.0, "f": "tiny"}, {"v": 1, "f": "1"}],
+                     [row["c"][1]
+                      for row in json.loads(table.ToJSon())["rows"]])
+    table.SetColumnPrecision("a", None)
+    self.assertEqual(0.1 + 0.2,
+                     json.loads(table.ToJSon())["rows"][0]["c"][0]["v"])
+    self.assertRaises(DataTableException, table.SetColumnPrecision, "c", 1)
+    self.assertRaises(DataTableException, table.SetColumnPrecision, "a", 1.5)
+    table = DataTable([("s", "string")])
+    self.assertRaises(DataTableException, table.SetColumnPrecision, "s", 1)
+
+  def testSharedCustomProperties(self):
+    row_cp = {"style": "color: red"}
+    cell_cp = {"className": "x", "n": 1e20}
+    table = DataTable([("a", "number"), ("b", "string")],
+                      [[(i, None, cell_cp), "b%d" % i] for i in range(3)])
+    table.SetRowsCustomProperties([0, 2], row_cp)
+    jscode = table.ToJSCode("t")
+    self.assertEqual(2, jscode.count("setRowProperties("))
+    self.assertTrue('t.setRowProperties(0, {"style":"color: red"});\n' in
+                    jscode)
+    self.assertEqual(3, jscode.count(', null, {"className":"x","n":1e+20})'))
+    json_obj = json.loads(table.ToJSon())
+    self.assertEqual([cell_cp] * 3,
+                     [row["c"][0]["p"] for row in json_obj["rows"]])
+    self.assertEqual([row_cp, None, row_cp],
+                     [row.get("p") for row in json_obj["rows"]])
+    # Every serialization encodes the properties as they are at the time.
+    row_cp["style"] = "color: blue"
+    self.assertTrue('t.setRowProperties(2, {"style":"color: blue"});\n' in
+                    table.ToJSCode("t"))
+
+  def testCacheEncodedRows(self):
+    description = [("a", "number"), ("b", "string"), ("c", "date")]
+    table = DataTable(description, custom_properties={"global_cp": "v"})
+    cached = DataTable(description, custom_properties={"global_cp": "v"},
+                       cache_encoded_rows=True)
+    self.assertEqual(table.ToJSon(), cached.ToJSon())
+    for i in range(3):
+      rows = [[i * 10 + j, "s%d" % j, date(2001, 1, 1 + j)] for j in range(3)]
+      table.AppendData(rows, custom_properties={"row_cp": i})
+      cached.AppendData(rows, custom_properties={"row_cp": i})
+      self.assertEqual(table.ToJSon(), cached.ToJSon())
+      self.assertEqual(table.ToJSonResponse(req_id=i),
+                       cached.ToJSonResponse(req_id=i))
+      self.assertEqual(table.ToJSon(columns_order=["c", "a", "b"]),
+                       cached.ToJSon(columns_order=["c", "a", "b"]))
+      self.assertEqual(table.ToJSon(order_by=("a", "desc")),
+                       cached.ToJSon(order_by=("a", "desc")))
+    # Every append was encoded once, as a fragment of its own.
+    unused_rows, num_encoded, fragments = (
+        cached._DataTable__encoded_rows[("a", "b", "c")])
+    self.assertEqual(9, num_encoded)
+    self.assertEqual(3, len(fragments))
+
+    table.SetRowsCustomProperties([0, 4], {"row_cp": "new"})
+    cached.SetRowsCustomProperties([0, 4], {"row_cp": "new"})
+    self.assertEqual(table.ToJSon(), cached.ToJSon())
+    table.LoadData([[1, "z"]])
+    cached.LoadData([[1, "z"]])
+    self.assertEqual(table.ToJSonResponse(), cached.ToJSonResponse())
+
+  def testConcurrentReaders(self):
+    description = [("a", "number"), ("b", "string")]
+    table = DataTable(description, [[0, "x"]], cache_encoded_rows=True)
+    snapshot = table._DataTable__snapshot
+    before = table.ToJSon()
+    table.AppendData([[1, "y"]])
+    table.SetRowsCustomProperties(0, {"cp": "v"})
+    # A reader still holding the old snapshot sees the table as it was.
+    table._DataTable__snapshot = snapshot
+    self.assertEqual(before, table.ToJSon())
+    self.assertEqual(1, table.NumberOfRows())
+
+    # A reader of a snapshot replaced by LoadData() does not fill the cache,
+    # and a cache filled from another list of rows is replaced.
+    table = DataTable(description, [[0, "x"]], cache_encoded_rows=True)
+    snapshot = table._DataTable__snapshot
+    table.LoadData([[1, "y"]])
+    current = table._DataTable__snapshot
+    table._DataTable__snapshot = snapshot
+    table.ToJSon()
+    self.assertEqual(snapshot[0],
+                     table._DataTable__encoded_rows[("a", "b")][0])
+    table._DataTable__snapshot = current
+    table.AppendData([[2, "z"]])
+    self.assertEqual(DataTable(description, [[1, "y"], [2, "z"]]).ToJSon(),
+                     table.ToJSon())
+    self.assertTrue(table._DataTable__encoded_rows[("a", "b")][0] is
+                    table._DataTable__snapshot[0])
+
+    # Invalid data leaves the table as it was.
+    table = DataTable(description, [[0, "x"]])
+    self.assertRaises(DataTableException, table.LoadData,
+                      [[1, "y"], [2, "z", "too long"]])
+    self.assertEqual(1, table.NumberOfRows())
+
+    # Readers in other threads only ever see whole loads.
+    results = []
+    def Read():
+      for unused_i in range(50):
+        results.append(len(table.ToJSon()))
+    threads = [threading.Thread(target=Read) for unused_i in range(3)]
+    sizes = set([len(table.ToJSon())])
+    for thread in threads:
+      thread.start()
+    for i in range(50):
+      table.LoadData([[j, "x"] for j in range(100 * (i % 2))])
+      sizes.add(len(table.ToJSon()))
+    for thread in threads:
+      thread.join()
+    self.assertTrue(set(results) <= sizes)
+
+    # Concurrent writers add to the column dictionaries one at a time.
+    table = DataTable(description, dictionary_columns=["b"])
+    def Append(i):
+      for j in range(20):
+        table.AppendData([[j, "s%d" % (j % 5)], [i, "t%d" % i]])
+    threads = [threading.Thread(target=Append, args=(i,)) for i in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(160, table.NumberOfRows())
+    values = table._DataTable__dictionaries["b"].values
+    self.assertEqual(9, len(values))
+    self.assertTrue(all(row["b"] is values[row["b"]]
+                        for row, unused_cp in table._Rows()))
+    # A writer waits for the lock before changing the dictionaries.
+    lock = table._DataTable__lock
+    with lock:
+      thread = threading.Thread(target=table.AppendData, args=([[0, "new"]],))
+      thread.start()
+      thread.join(0.1)
+      self.assertTrue(thread.is_alive())
+      self.assertNotIn("new", values)
+    thread.join()
+    self.assertIn("new", values)
+
+  def testParallelSerialization(self):
+    if gviz_api.futures is None:
+      return
+    description = [("a", "number"), ("b", "string"), ("c", "date")]
+    table = DataTable(description, custom_properties={"global_cp": "v"})
+    for i in range(10):
+      table.AppendData([[i * 10 + j, "s\u05d0%d" % j, date(2001, 1, 1 + j)]
+                        for j in range(10)], custom_properties={"row_cp": i})
+    json_str = table.ToJSon(order_by=("a", "desc"))
+    csv_str = table.ToCsv(columns_order=["c", "a", "b"])
+    cached = DataTable(description, cache_encoded_rows=True)
+    cached.LoadData([[1, "a", None]] * 35)
+    cached_str = cached.ToJSon()
+
+    saved = gviz_api._PARALLEL_MIN_ROWS, gviz_api._PARALLEL_PART_ROWS
+    gviz_api._PARALLEL_MIN_ROWS, gviz_api._PARALLEL_PART_ROWS = 30, 7
+    try:
+      with gviz_api.futures.ThreadPoolExecutor(3) as executor:
+        for workers in (executor, 2):
+          self.assertEqual(json_str,
+                           table.ToJSon(order_by=("a", "desc"),
+                                        workers=workers))
+          self.assertEqual(csv_str,
+                           table.ToCsv(columns_order=["c", "a", "b"],
+                                       workers=workers))
+          cached.AppendData([[2, "b", None]])
+          cached_str = cached_str[:-2] + ',{"c":[{"v":2},{"v":"b"},null]}]}'
+          self.assertEqual(cached_str, cached.ToJSon(workers=workers))
+      # Without fork, the parts are pickled to the worker processes.
+      saved_context = gviz_api._FORK_CONTEXT
+      gviz_api._FORK_CONTEXT = None
+      try:
+        self.assertEqual(csv_str,
+                         table.ToCsv(columns_order=["c", "a", "b"], workers=2))
+      finally:
+        gviz_api._FORK_CONTEXT = saved_context
+      # Small tables are serialized serially.
+      gviz_api._PARALLEL_MIN_ROWS = 1000
+      self.assertEqual(json_str,
+                       table.ToJSon(order_by=("a", "desc"), workers=object()))
+    finally:
+      gviz_api._PARALLEL_MIN_ROWS, gviz_api._PARALLEL_PART_ROWS = saved
+
+  def testCsvFormattersBuiltOncePerCall(self):
+    table = DataTable([("a", "number"), ("b", "date")],
+                      [[i % 3, date(2001, 1, 1 + i % 3)] for i in range(2500)])
+    table.stats = gviz_api.DataTableStats()
+    built = []
+    csv_formatter = table._CsvFormatter
+    def CountingFormatter(value_type):
+      built.append(value_type)
+      return csv_formatter(value_type)
+    table._CsvFormatter = CountingFormatter
+    csv_str = table.ToCsv()
+    self.assertEqual(["number", "date"], built)
+    self.assertEqual(csv_str, "".join(table.IterCsv()))
+    self.assertEqual(["number", "date"] * 2, built)
+    # Every chunk records only its own conversions.
+    self.assertEqual(2 * 2500 * 2, table.stats.counts["convert"])
+
+  def testIterResponse(self):
+    table = DataTable([("a", "number"), ("b", "string")],
+                      [[i, "s\u05d0%d" % i] for i in range(2500)],
+                      custom_properties={"cp": "v"})
+    for tqx in ("", "reqId:3;responseHandler:handle", "out:html", "out:csv",
+                "out:tsv-excel", "out:binary"):
+      chunks = list(table.IterResponse(order_by=("a", "desc"), tqx=tqx))
+      self.assertTrue(len(chunks) > 1 or tqx == "out:binary")
+      self.assertEqual(table.ToResponse(order_by=("a", "desc"), tqx=tqx),
+                       chunks[0][:0].join(chunks))
+    self.assertEqual(table.ToResponse(tqx="sinceVersion:%s" % table.version),
+                     "".join(table.IterResponse(
+                         tqx="sinceVersion:%s" % table.version)))
+    self.assertRaises(DataTableException, table.IterResponse, tqx="out:bad")
+    self.assertRaises(DataTableException, table.IterResponse,
+                      tqx="version:0.1")
+
+  def testCompressedResponses(self):
+    description = [("a", "number"), ("b", "string")]
+    table = DataTable(description, custom_properties={"cp": "v"})
+    cached = DataTable(description, custom_properties={"cp": "v"},
+                       cache_encoded_rows=True)
+    decompress = {"gzip": lambda data: zlib.decompress(data, 16 + 15),
+                  "deflate": zlib.decompress}
+    for i in range(3):
+      rows = [[i * 1000 + j, "s\u05d0%d" % j] for j in range(1500)]
+      table.AppendData(rows)
+      cached.AppendData(rows)
+      for compress in ("gzip", "deflate"):
+        for data_table in (table, cached):
+          chunks = list(data_table.IterJSonResponse(req_id=i,
+                                                    compress=compress))
+          self.assertEqual(table.ToJSonResponse(req_id=i),
+                           decompress[compress](b"".join(chunks)).decode(
+                               "utf-8"))
+          chunks = list(data_table.IterResponse(tqx="out:csv",
+                                                compress=compress))
+          self.assertEqual(table.ToCsv(),
+                           decompress[compress](b"".join(chunks)).decode(
+                               "utf-8"))
+    # The compressed rows are cached, a segment per append.
+    fragments, pieces, window = cached._DataTable__deflated_rows[("a", "b")]
+    self.assertEqual(gviz_api._DEFLATE_WINDOW, len(window))
+    self.assertEqual(3, len(pieces))
+    list(cached.IterJSonResponse(compress="gzip"))
+    self.assertTrue(
+        pieces[0] is cached._DataTable__deflated_rows[("a", "b")][1][0])
+    cached.LoadData([[1, "x"]])
+    self.assertEqual(cached.ToJSonResponse(),
+                     zlib.decompress(b"".join(cached.IterJSonResponse(
+                         compress="deflate"))).decode("utf-8"))
+    self.assertRaises(DataTableException, table.IterJSonResponse,
+                      compress="bad")
+    self.assertRaises(DataTableException, table.IterResponse,
+                      tqx="out:csv", compress="bad")
+
+  def testCompressedCachedRowsShareHistory(self):
+    # Small appends, as a live dashboard polls them, compress about as well
+    # as the whole response at once.
+    table = DataTable([("a", "number"), ("b", "string")],
+                      cache_encoded_rows=True)
+    for i in range(200):
+      table.AppendData([[i * 5 + j, "event %d" % j] for j in range(5)])
+      body = b"".join(table.IterJSonResponse(compress="gzip"))
+    response = table.ToJSonResponse()
+    self.assertEqual(response, zlib.decompress(body, 16 + 15).decode("utf-8"))
+    self.assertLess(len(body),
+                    1.2 * len(zlib.compress(response.encode("utf-8"))))
+    # Only the rows adding up to a segment are cached compressed.
+    unused_fragments, pieces, unused_window = (
+        table._DataTable__deflated_rows[("a", "b")])
+    self.assertTrue(1 < len(pieces) < 10)
+
+  def testResponseAsync(self):
+    if gviz_api.asyncio is None:
+      return
+    asyncio = gviz_api.asyncio
+    table = DataTable([("a", "number")], [[i] for i in range(2500)])
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+      self.assertEqual(table.ToResponse(tqx="out:csv"),
+                       loop.run_until_complete(
+                           table.ToResponseAsync(tqx="out:csv")))
+      chunks = []
+      iterator = table.IterResponseAsync(tqx="reqId:4")
+      self.assertTrue(iterator.__aiter__() is iterator)
+      while True:
+        try:
+          awaitable = iterator.__anext__()
+        except StopAsyncIteration:
+          break
+        chunks.append(loop.run_until_complete(awaitable))
+      self.assertEqual(5, len(chunks))
+      self.assertEqual(table.ToResponse(tqx="reqId:4"), "".join(chunks))
+    finally:
+      asyncio.set_event_loop(None)
+      loop.close()
+
+  def testDeltaResponse(self):
+    def Response(table, since_version):
+      text = table.ToJSonResponse(response_handler="",
+                                  since_version=since_version)
+      return json.loads(text[1:-2])
+
+    table = DataTable([("a", "number")], [[1], [2]])
+    response = Response(table, "bad")
+    self.assertFalse(response["delta"])
+    self.assertEqual(2, len(response["table"]["rows"]))
+    version = response["dataVersion"]
+    self.assertEqual(table.version, version)
+
+    table.AppendData([[3], [4]])
+    response = Response(table, version)
+    self.assertTrue(response["delta"])
+    self.assertEqual([{"c": [{"v": 3}]}, {"c": [{"v": 4}]}],
+                     response["table"]["rows"])
+    version = response["dataVersion"]
+    response = Response(table, version)
+    self.assertTrue(response["delta"])
+    self.assertEqual([], response["table"]["rows"])
+
+    # Changing rows in place makes older versions useless.
+    table.SetRowsCustomProperties(0, {"p": "v"})
+    response = Response(table, version)
+    self.assertFalse(response["delta"])
+    self.assertEqual(4, len(response["table"]["rows"]))
+    table.LoadData([[5]])
+    self.assertFalse(Response(table, response["dataVersion"])["delta"])
+
+    # Versions of other tables are not accepted.
+    other = DataTable([("a", "number")], [[1], [2]])
+    self.assertFalse(Response(other, table.version)["delta"])
+
+    # Only the last _DELTA_VERSIONS versions are kept.
+    version = table.version
+    saved = gviz_api._DELTA_VERSIONS
+    try:
+      gviz_api._DELTA_VERSIONS = 3
+      table.AppendData([[6]])
+      table.AppendData([[7]])
+      self.assertTrue(Response(table, version)["delta"])
+      table.AppendData([[8]])
+      self.assertFalse(Response(table, version)["delta"])
+      self.assertEqual(3, len(table._DataTable__snapshot[3]))
+    finally:
+      gviz_api._DELTA_VERSIONS = saved
+
+    # Without since_version the response is unchanged, and tqx passes it on.
+    self.assertNotIn("delta", Response(table, None))
+    response = json.loads(table.ToResponse(
+        tqx="responseHandler:;sinceVersion:%s" % table.version)[1:-2])
+    self.assertTrue(response["delta"])
+    self.assertEqual([], response["table"]["rows"])
+
   def testCustomProperties(self):
     # The json of the initial data we load to the table.
     json_obj = {"cols": [{"id": "a",
@@ -474,6 +999,56 @@ class DataTableTest(unittest.TestCase):
     self.assertEqual(csv_string.replace(",", "\t").encode("UTF-16LE"),
                      table.ToTsvExcel())
 
+    tsv_file = six.BytesIO()
+    table.WriteTsvExcel(tsv_file, bom=True)
+    self.assertEqual(b"\xff\xfe" + table.ToTsvExcel(), tsv_file.getvalue())
+
+  def testCsvFormatter(self):
+    cases = [("number", 5, "5"),
+             ("number", -1.5, "-1.5"),
+             ("number", True, "1"),
+             ("number", decimal.Decimal("0.5"), "0.5"),
+             ("number", (3, "3$"), "3"),
+             ("number", (None, "none"), "(empty)"),
+             ("string", u"\u05d0", u"\u05d0"),
+             ("string", u"\u05d0".encode("utf-8"), u"\u05d0"),
+             ("string", 7, "7"),
+             ("boolean", False, "false"),
+             ("boolean", 1, "true"),
+             ("date", date(2001, 2, 3), "2001-02-03"),
+             ("date", datetime(2001, 2, 3, 4, 5, 6), "2001-02-03"),
+             ("date", (date(2001, 2, 3), "Feb 3"), "Feb 3"),
+             ("datetime", datetime(2001, 2, 3, 4, 5, 6, 7000),
+              "2001-02-03 04:05:06.007000"),
+             ("timeofday", time(1, 2, 3), "01:02:03"),
+             ("timeofday", datetime(2001, 2, 3, 4, 5, 6), "04:05:06"),
+             ("number", None, "")]
+    for value_type, value, expected in cases:
+      formatted = DataTable._CsvFormatter(value_type)(value)
+      if not isinstance(formatted, six.text_type):
+        formatted = formatted.decode("utf-8")
+      self.assertEqual(expected, formatted)
+    self.assertRaises(DataTableException,
+                      DataTable._CsvFormatter("number"), "a")
+
+  def testWriteCsv(self):
+    table = DataTable([("a", "number", "A"), ("b", "string")],
+                      [[i, u"\u05d0%d" % i] for i in range(2500)])
+    chunks = list(table.IterCsv())
+    # Header, then two full chunks of rows and the remainder.
+    self.assertEqual(4, len(chunks))
+    self.assertEqual("A,b\r\n", chunks[0])
+    self.assertEqual(table.ToCsv(), "".join(chunks))
+
+    text_file = six.StringIO()
+    table.WriteCsv(text_file)
+    self.assertEqual(table.ToCsv(), text_file.getvalue())
+
+    binary_file = six.BytesIO()
+    table.WriteCsv(binary_file, separator="\t", encoding="utf-8")
+    self.assertEqual(table.ToCsv(separator="\t").encode("utf-8"),
+                     binary_file.getvalue())
+
   def testToHtml(self):
     html_table_header = "<html><body><table border=\"1\">"
     html_table_footer = "</table></body></html>"
@@ -508,6 +1083,273 @@ class DataTableTest(unittest.TestCase):
     self.assertEqual(init_data_html.replace("\n", ""),
                      table.ToHtml(columns_order=["t", "d", "dt"]))
 
+  def testWriteHtml(self):
+    table = DataTable([("a", "number", "A"), ("b", "string")],
+                      [[(i, "<%d>" % i), "&%d" % i] for i in range(1500)] +
+                      [[1.5, None], [True, None]])
+    chunks = list(table.IterHtml())
+    # Header, two chunks of rows and the footer.
+    self.assertEqual(4, len(chunks))
+    self.assertEqual("<html><body><table border=\"1\">"
+                     "<thead><tr><th>A</th><th>b</th></tr></thead><tbody>"
+                     "<tr><td>&lt;0&gt;</td><td>&amp;0</td></tr>",
+                     chunks[0] + chunks[1][:len("<tr><td>&lt;0&gt;</td>"
+                                                "<td>&amp;0</td></tr>")])
+    self.assertTrue(chunks[2].endswith("<tr><td>1.5</td><td></td></tr>"
+                                       "<tr><td>1</td><td></td></tr>"))
+    self.assertEqual("</tbody></table></body></html>", chunks[3])
+    self.assertEqual(table.ToHtml(), "".join(chunks))
+
+    html_file = six.BytesIO()
+    table.WriteHtml(html_file, columns_order=["b", "a"], encoding="utf-8")
+    self.assertEqual(
+        table.ToHtml(columns_order=["b", "a"]).encode("utf-8"),
+        html_file.getvalue())
+
+  def testBinary(self):
+    table = DataTable([("a", "number", "A", {"col_cp": "col_v"}),
+                       ("b", "string"), ("c", "boolean"), ("d", "date"),
+                       ("e", "datetime"), ("f", "timeofday"),
+                       ("g", "number")],
+                      custom_properties={"global_cp": "global_v"})
+    table.AppendData([[1, u"\u05d0", True, date(2001, 2, 3),
+                       datetime(2001, 2, 3, 4, 5, 6, 555000), time(1, 2, 3),
+                       1.5],
+                      [(2, "2$"), None, False, datetime(2002, 3, 4, 5, 6),
+                       None, (None, "none", {"cell_cp": "cell_v"}), 2 ** 70],
+                      [None, "x", None, None,
+                       datetime(1, 1, 1), time(23, 59, 59, 999999), 3]],
+                     custom_properties={"row_cp": "row_v"})
+    table.AppendData([[-2 ** 63, "", True]])
+    table.SetRowsCustomProperties(3, {"row_cp2": "row_v2"})
+
+    binary = table.ToBinary()
+    self.assertEqual(b"GVZB", binary[:4])
+    self.assertEqual(binary, table.ToResponse(tqx="out:binary"))
+    copy = DataTable.FromBinary(binary)
+    self.assertEqual(table.columns, copy.columns)
+    self.assertEqual(4, copy.NumberOfRows())
+    self.assertEqual(table.ToJSon(), copy.ToJSon())
+    self.assertEqual(table.ToJSCode("t"), copy.ToJSCode("t"))
+    self.assertEqual(table.ToCsv(), copy.ToCsv())
+    self.assertEqual(binary, copy.ToBinary())
+
+    table = DataTable([("a", "number"), ("b", "string")],
+                      [[3, "c"], [1, "a"], [2, "b"]])
+    self.assertEqual(table.ToJSon(columns_order=["b", "a"], order_by="a"),
+                     DataTable.FromBinary(table.ToBinary(
+                         columns_order=["b", "a"], order_by="a")).ToJSon())
+
+    # Nested descriptions are kept, so the copy accepts the same data.
+    table = DataTable({("a", "number"): {"b": "string", "c": "number"}},
+                      {1: {"b": "z", "c": 2}})
+    copy = DataTable.FromBinary(table.ToBinary())
+    table.AppendData({3: {"b": "w"}})
+    copy.AppendData({3: {"b": "w"}})
+    self.assertEqual(table.ToJSon(), copy.ToJSon())
+
+    self.assertRaises(DataTableException, DataTable.FromBinary, b"GVZA" * 4)
+    table = DataTable([("a", "number")], [["z"]])
+    self.assertRaises(DataTableException, table.ToBinary)
+
+    # Malformed images are rejected rather than read partly.
+    binary = DataTable([("a", "number"), ("b", "string"), ("c", "number")],
+                       [[1, "x", 1.5], [2, "y", 2 ** 70]]).ToBinary()
+    prefix = gviz_api._BINARY_PREFIX
+    magic, version, flags, header_length = prefix.unpack(binary[:prefix.size])
+    header = json.loads(binary[prefix.size:prefix.size + header_length])
+    data = binary[prefix.size + header_length:]
+    def Image(header, data=data):
+      header_bytes = json.dumps(header).encode("utf-8")
+      return prefix.pack(magic, version, flags, len(header_bytes)) + (
+          header_bytes + data)
+    self.assertEqual(2, DataTable.FromBinary(Image(header)).NumberOfRows())
+    # Only the padding after the last buffer can be cut.
+    data_end = max(offset + length for column_header in header["columns"]
+                   for offset, length in column_header["buffers"])
+    self.assertEqual(2, DataTable.FromBinary(
+        Image(header, data[:data_end])).NumberOfRows())
+    for size in range(data_end - 16, data_end):
+      self.assertRaises(DataTableException, DataTable.FromBinary,
+                        Image(header, data[:size]))
+    self.assertRaises(DataTableException, DataTable.FromBinary,
+                      binary[:prefix.size + header_length - 1])
+    self.assertRaises(DataTableException, DataTable.FromBinary,
+                      binary[:prefix.size] + b"{" * header_length + data)
+    bad_headers = [dict(header, rows=3), dict(header, rows=1),
+                   dict(header, rows="2"), dict(header, cols=[{"id": "a"}]),
+                   dict(header, row_p_index=[[0, 0]]), [header]]
+    for key in gviz_api._BINARY_HEADER_KEYS:
+      bad_headers.append(dict([item for item in header.items()
+                               if item[0] != key]))
+    for encoding in ("bitmap", "days", "json", "utf8", "bogus"):
+      columns = [dict(column_header, encoding=encoding)
+                 for column_header in header["columns"]]
+      bad_headers.append(dict(header, columns=columns))
+    for bad_header in bad_headers:
+      self.assertRaises(DataTableException, DataTable.FromBinary,
+                        Image(bad_header))
+
+  def testDictionaryColumns(self):
+    description = [("a", "number"), ("b", "string"), ("c", "string")]
+    rows = [[i, "s<%d>" % (i % 3), "%d" % i] for i in range(1200)]
+    rows[5][1] = ("s<1>", "One", {"cell_cp": "v"})
+    rows[6][1] = None
+    table = DataTable(description, rows)
+    encoded = DataTable(description, rows, dictionary_columns=["b"])
+    auto = DataTable(description, rows, dictionary_columns="auto")
+    for other in (encoded, auto):
+      self.assertEqual(table.ToJSon(order_by=("a", "desc")),
+                       other.ToJSon(order_by=("a", "desc")))
+      self.assertEqual(table.ToJSCode("t"), other.ToJSCode("t"))
+      self.assertEqual(table.ToHtml(), other.ToHtml())
+      self.assertEqual(table.ToCsv(), other.ToCsv())
+      # Every distinct string is held once.
+      data = other._Rows()
+      self.assertTrue(data[1][0]["b"] is data[4][0]["b"])
+    # The column of distinct strings is not dictionary encoded.
+    self.assertEqual(["b"], list(auto._DataTable__dictionaries))
+
+    encoded.AppendData([[2000, "s<1>", "x"]])
+    self.assertTrue(encoded._Rows()[-1][0]["b"] is encoded._Rows()[1][0]["b"])
+    encoded.LoadData([[1, "new"]])
+    self.assertEqual(
+        {"new": "new"}, encoded._DataTable__dictionaries["b"].values)
+    self.assertRaises(DataTableException, DataTable, description,
+                      dictionary_columns=["a"])
+
+    # Repeated strings are dictionary encoded in the binary format as well.
+    binary = table.ToBinary()
+    self.assertTrue(b'"encoding":"dictionary"' in binary)
+    self.assertEqual(table.ToJSon(), DataTable.FromBinary(binary).ToJSon())
+    table = DataTable([("b", "string")], [[None], [None]])
+    self.assertEqual(table.ToJSon(),
+                     DataTable.FromBinary(table.ToBinary()).ToJSon())
+
+  def testSaveOpen(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    path = os.path.join(temp_dir, "table.gvzb")
+    table = DataTable([("a", "number", "A", {"col_cp": "col_v"}),
+                       ("b", "string"), ("c", "boolean"), ("d", "date"),
+                       ("e", "datetime"), ("f", "timeofday")],
+                      custom_properties={"global_cp": "global_v"})
+    table.LoadData([[i, "s%d" % (i % 7), i % 3 == 0,
+                     date(2001, 2, 3) + timedelta(days=i),
+                     datetime(2001, 2, 3) + timedelta(seconds=i * 61),
+                     time(i % 24, 2, 3)] for i in range(2500)])
+    table.AppendData([[3, u"\u05d0", None, None, None,
+                       (None, "none", {"cell_cp": "cell_v"})],
+                      [4, None, False]],
+                     custom_properties={"row_cp": "row_v"})
+    table.Save(path)
+    self.assertEqual([], [name for name in os.listdir(temp_dir)
+                          if name != "table.gvzb"])
+
+    opened = DataTable.Open(path)
+    self.assertEqual(table.columns, opened.columns)
+    self.assertEqual(2502, opened.NumberOfRows())
+    self.assertEqual(table.ToJSon(), opened.ToJSon())
+    self.assertEqual(table.ToJSon(order_by=("a", "desc")),
+                     opened.ToJSon(order_by=("a", "desc")))
+    self.assertEqual(table.ToJSCode("t"), opened.ToJSCode("t"))
+    self.assertEqual(table.ToCsv(), opened.ToCsv())
+    self.assertEqual(table.ToHtml(), opened.ToHtml())
+    self.assertEqual(table.ToBinary(), opened.ToBinary())
+    self.assertEqual(table.ToResponse(tqx="reqId:1"),
+                     opened.ToResponse(tqx="reqId:1"))
+    rows = opened._Rows()
+    self.assertEqual(table._Rows()[1000:1010], list(rows[1000:1010]))
+    self.assertEqual(table._Rows()[-3], rows[-3])
+    self.assertEqual(table.ToJSon(),
+                     pickle.loads(pickle.dumps(opened)).ToJSon())
+
+    # Changes copy the rows into memory, and leave the file as it was.
+    opened.AppendData([[5]])
+    table.AppendData([[5]])
+    opened.SetRowsCustomProperties(0, {"x": "y"})
+    table.SetRowsCustomProperties(0, {"x": "y"})
+    self.assertEqual(table.ToJSon(), opened.ToJSon())
+    self.assertEqual(2502, DataTable.Open(path).NumberOfRows())
+
+    with open(path, "wb"):
+      pass
+    self.assertRaises(DataTableException, DataTable.Open, path)
+
+  @unittest.skipIf(gviz_api.shared_memory is None,
+                   "multiprocessing.shared_memory is not available")
+  def testSharedMemory(self):
+    name = "gviz_test_%d_%d" % (os.getpid(), id(self) % 10000)
+    self.addCleanup(DataTable.UnlinkSharedMemory, name)
+    self.assertEqual(0, DataTable.SharedMemoryGeneration(name))
+    self.assertRaises(DataTableException, DataTable.FromSharedMemory, name)
+
+    table = DataTable([("a", "number"), ("b", "string"), ("c", "date")],
+                      [[i, "s%d" % (i % 5), date(2001, 2, 3)]
+                       for i in range(1500)],
+                      custom_properties={"global_cp": "global_v"})
+    self.assertEqual(1, table.ToSharedMemory(name))
+    self.assertEqual(1, DataTable.SharedMemoryGeneration(name))
+    shared = DataTable.FromSharedMemory(name)
+    self.assertEqual(table.ToJSonResponse(), shared.ToJSonResponse())
+    self.assertEqual(table.ToCsv(), shared.ToCsv())
+
+    table.AppendData([[-1, "new"]])
+    self.assertEqual(2, table.ToSharedMemory(name, order_by="a"))
+    self.assertEqual(2, DataTable.SharedMemoryGeneration(name))
+    # Readers of the previous generation keep it.
+    self.assertEqual(1500, shared.NumberOfRows())
+    self.assertEqual(table.ToJSon(order_by="a"),
+                     DataTable.FromSharedMemory(name).ToJSon())
+    self.assertEqual(table.ToJSon(order_by="a"),
+                     DataTable.FromSharedMemory(name, 2).ToJSon())
+    self.assertRaises(DataTableException, DataTable.FromSharedMemory, name, 1)
+    del shared
+
+    DataTable.UnlinkSharedMemory(name)
+    self.assertEqual(0, DataTable.SharedMemoryGeneration(name))
+
+  def testPickle(self):
+    stats = gviz_api.DataTableStats()
+    table = DataTable([("a", "number"), ("b", "string"), ("c", "datetime")],
+                      custom_properties={"global_cp": "global_v"},
+                      cache_encoded_rows=True, stats=stats,
+                      dictionary_columns=["b"], compact_pickle=True)
+    table.AppendData([[i, "s%d" % (i % 3), datetime(2001, 2, 3, 4, 5, i % 60)]
+                      for i in range(100)])
+    version = table.version
+    table.AppendData([[(1, "1$", {"cell_cp": "v"}), None]],
+                     custom_properties={"row_cp": "row_v"})
+    table.ToJSon()
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+      data = pickle.dumps(table, protocol)
+      copy = pickle.loads(data)
+      self.assertEqual({}, copy._DataTable__encoded_rows)
+      self.assertEqual(table.ToJSon(), copy.ToJSon())
+      self.assertEqual(table.version, copy.version)
+      self.assertEqual(table.ToJSonResponse(since_version=version),
+                       copy.ToJSonResponse(since_version=version))
+      self.assertTrue(isinstance(copy.stats, gviz_api.DataTableStats))
+      rows = copy._Rows()
+      self.assertTrue(rows[0][0]["b"] is rows[3][0]["b"])
+      copy.AppendData([[1000, "s1"]])
+      self.assertEqual(102, copy.NumberOfRows())
+    # The rows are held in the binary format, not as pickled rows.
+    self.assertFalse(b"s2" in data)
+    self.assertTrue(copy.compact_pickle)
+
+    # Tables are pickled as usual unless compact_pickle is set.
+    table.compact_pickle = False
+    data = pickle.dumps(table)
+    self.assertTrue(b"s2" in data)
+    self.assertEqual(table.ToJSon(), pickle.loads(data).ToJSon())
+
+    # Tables which the binary format cannot hold are pickled as usual.
+    table = DataTable([("a", "number"), ("b", "string")], [["z", "y"]],
+                      compact_pickle=True)
+    self.assertEqual([({"a": "z", "b": "y"}, None)],
+                     pickle.loads(pickle.dumps(table))._Rows())
+
   def testOrderBy(self):
     data = [("b", 3), ("a", 3), ("a", 2), ("b", 1)]
     description = ["col1", ("col2", "number", "Second Column")]
@@ -538,6 +1380,81 @@ class DataTableTest(unittest.TestCase):
                      table.ToJSCode("mytab",
                                     order_by=[("col1", "desc"), "col2"]))
 
+  @unittest.skipIf(gviz_api.numpy is None, "numpy is not installed")
+  def testNumpyOrderBy(self):
+    description = [("i", "number"), ("f", "number"), ("d", "date"),
+                   ("t", "datetime"), ("s", "string")]
+    data = [[i * 7 % 5, (i * 13 % 4) / 2.0 if i % 3 else i % 2,
+             date(2000, 1, 1 + i * 11 % 3),
+             datetime(2000, 1, 1, 0, i * 17 % 4), "s%d" % i]
+            for i in range(60)]
+    orders = [["i", "f"], [("i", "desc"), "f"], [("d", "desc"), "t", "i"],
+              [("t", "desc"), ("f", "desc")], ["s", "i"]]
+    table = DataTable(description, data)
+    sorted_data = [table._PreparedData(order_by) for order_by in orders]
+    saved = gviz_api._NUMPY_SORT_MIN_ROWS
+    try:
+      gviz_api._NUMPY_SORT_MIN_ROWS = 0
+      self.assertEqual(sorted_data, [table._PreparedData(order_by)
+                                     for order_by in orders])
+      # Values numpy cannot order exactly are sorted by list.sort().
+      table = DataTable([("i", "number"), ("j", "number")],
+                        [[2 ** 70, 1], [-1, 2], [2 ** 70, 0]])
+      self.assertEqual([[-1, 2], [2 ** 70, 0], [2 ** 70, 1]],
+                       [[row[0]["i"], row[0]["j"]]
+                        for row in table._PreparedData(["i", "j"])])
+    finally:
+      gviz_api._NUMPY_SORT_MIN_ROWS = saved
+
+  def testJSONBackends(self):
+    table = DataTable([("a", "number"), ("b", "string"), ("c", "datetime"),
+                       ("d", "timeofday")],
+                      [[float("nan"), u"\u05d0\u2028\x7f", datetime(1, 2, 3),
+                        time(1, 2, 3)],
+                       [1e-5, "\n\"\\/", datetime(1, 2, 3, 4, 5, 6, 555000)],
+                       [(2 ** 70, "big"), None, (None, "none")],
+                       [float("-inf"), ("x", "y", {"cell_cp": 1.5e300})],
+                       [0.1 + 0.2]],
+                      custom_properties={"global_cp": [1, 2.5, None]})
+    table.SetRowsCustomProperties(1, {1: "non-string key"})
+
+    gviz_api.SetJSONBackend("json")
+    try:
+      expected = (table.ToJSon(), table.ToJSonResponse(), table.ToJSCode("t"))
+      self.assertTrue(expected[0].startswith(
+          '{"cols":[{"id":"a","label":"a","type":"number"}'))
+      self.assertTrue('{"c":[{"v":NaN}' in expected[0])
+      for backend in ("auto",) + tuple(gviz_api._JSON_ENCODERS):
+        gviz_api.SetJSONBackend(backend)
+        self.assertEqual(expected, (table.ToJSon(), table.ToJSonResponse(),
+                                    table.ToJSCode("t")))
+      self.assertRaises(DataTableException, gviz_api.SetJSONBackend, "nope")
+
+      # With orjson, only the chunk of rows holding a value orjson cannot
+      # encode falls back to the json module.
+      table = DataTable([("a", "number")], [[i + 0.5] for i in range(2500)])
+      table.AppendData([[float("nan")]])
+      gviz_api.SetJSONBackend("json")
+      expected = table.ToJSon()
+      if gviz_api.orjson is not None:
+        gviz_api.SetJSONBackend("orjson")
+        encoded = []
+        encode = gviz_api.DataTableJSONEncoder.encode
+        def RecordingEncode(encoder, o):
+          encoded.append(o)
+          return encode(encoder, o)
+        gviz_api.DataTableJSONEncoder.encode = RecordingEncode
+        try:
+          self.assertEqual(expected, table.ToJSon())
+        finally:
+          gviz_api.DataTableJSONEncoder.encode = encode
+        self.assertEqual([501], [len(rows) for rows in encoded])
+      if gviz_api.orjson is None:
+        self.assertRaises(DataTableException, gviz_api.SetJSONBackend,
+                          "orjson")
+    finally:
+      gviz_api.SetJSONBackend()
+
   def testToJSonResponse(self):
     description = ["col1", "col2", "col3"]
     data = [("1", "2", "3"), ("a", "b", "c"), ("One", "Two", "Three")]
@@ -566,6 +1483,29 @@ class DataTableTest(unittest.TestCase):
     json_response_obj = json.loads(json_response[len(start_str_handler) + 1:-2])
     self.assertEqual(json_response_obj["table"], json.loads(json_str))
 
+  def testBytesOutput(self):
+    description = [("a", "number"), ("b", "string"), ("c", "date")]
+    data = [[i / 7.0, u"\u05e9 %d" % i, date(2000, 1, 1 + i % 28)]
+            for i in range(25)]
+    for cache_encoded_rows in (False, True):
+      table = DataTable(description, data, custom_properties={"p": "v"},
+                        cache_encoded_rows=cache_encoded_rows)
+      for order_by in ((), "b"):
+        self.assertEqual(table.ToJSon(order_by=order_by).encode("utf-8"),
+                         table.ToJSonBytes(order_by=order_by))
+        self.assertEqual(
+            table.ToJSonResponse(order_by=order_by, req_id=3,
+                                 response_handler="h").encode("utf-8"),
+            table.ToJSonResponseBytes(order_by=order_by, req_id=3,
+                                      response_handler="h"))
+      version = table.version
+      table.AppendData([[1, "x", None]])
+      self.assertEqual(
+          table.ToJSonResponse(since_version=version).encode("utf-8"),
+          table.ToJSonResponseBytes(since_version=version))
+      self.assertEqual(table.ToTsvExcel(),
+                       table.ToCsv(separator="\t").encode("UTF-16LE"))
+
   def testToResponse(self):
     description = ["col1", "col2", "col3"]
     data = [("1", "2", "3"), ("a", "b", "c"), ("One", "Two", "Three")]
@@ -40,12 +40,7 @@ setuptools.setup(
         "Intended Audience :: Developers",
         "Topic :: Software Development :: Libraries :: Python Modules",
         "License :: OSI Approved :: Apache Software License",
-        "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.6",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.3",
-        "Programming Language :: Python :: 3.4",
         "Programming Language :: Python :: 3.5",
         "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
@@ -54,7 +49,9 @@ setuptools.setup(
         "Programming Language :: Python :: 3.10",
     ],
     keywords="gviz,google visualization",
-    py_modules=["gviz_api"],
+    py_modules=["gviz_api", "gviz_api_server"],
+    # gviz_api_server uses async syntax.
+    python_requires=">=3.5",
     install_requires=["six"],
     test_suite="gviz_api_test",
 )